@@ -0,0 +1,102 @@
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+
+from cache import load_20newsgroups
+from compressors import Compressor, get_compressor
+from distances import iter_ncd, knn_accuracy, ncd_top_k
+
+
+def parse_compressor(spec: str) -> Compressor:
+    name, _, level = spec.partition(":")
+    return get_compressor(name, int(level) if level else None)
+
+
+def benchmark(
+        compressor: Compressor,
+        train_set: list[bytes],
+        test_set: list[bytes],
+        train_target: np.ndarray,
+        test_target: np.ndarray,
+        k: int
+) -> dict:
+    """
+    Runs the kNN classifier on the given subsample and reports throughput, accuracy and memory of the compressor.
+    """
+    start = time.perf_counter()
+    compressor.fit(train_set)
+    fit_seconds = time.perf_counter() - start
+
+    compressed_train = [compressor.compressed_len(x2) for x2 in train_set]
+    compressed_test = [compressor.compressed_len(x1) for x1 in test_set]
+
+    start = time.perf_counter()
+    top_k_indices = np.array([
+        ncd_top_k(x1, Cx1, train_set, compressed_train, compressor, k)[0]
+        for x1, Cx1 in zip(test_set, compressed_test)
+    ])
+    elapsed = time.perf_counter() - start
+
+    # memory is traced on a single row only, tracing slows down the timed run considerably
+    tracemalloc.start()
+    for _ in iter_ncd(test_set[0], compressed_test[0], train_set, compressed_train, compressor):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "compressor": compressor.name,
+        "pairs_per_second": len(test_set) * len(train_set) / elapsed,
+        "accuracy": knn_accuracy(top_k_indices, train_target, test_target),
+        "peak_memory_kib": peak / 1024,
+        "fit_seconds": fit_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Benchmark compressors for the normalised compression distance")
+    parser.add_argument(
+        "--compressors",
+        nargs="+",
+        default=["gzip", "zlib:1", "zlib:6", "bz2", "lzma", "zstd"],
+        help="Compressors to benchmark as name or name:level"
+    )
+    parser.add_argument("--train-size", default=2000, type=int)
+    parser.add_argument("--test-size", default=200, type=int)
+    parser.add_argument("--k", default=2, type=int)
+    parser.add_argument("--seed", default=123, type=int)
+    args = parser.parse_args()
+
+    dataset_train, dataset_train_target = load_20newsgroups("train")
+    dataset_test, dataset_test_target = load_20newsgroups("test")
+
+    # a fixed subsample, so results are comparable between runs and machines
+    rng = np.random.default_rng(args.seed)
+    train_idx = rng.choice(len(dataset_train), size=args.train_size, replace=False)
+    test_idx = rng.choice(len(dataset_test), size=args.test_size, replace=False)
+
+    train_set = [dataset_train[i] for i in train_idx]
+    test_set = [dataset_test[i] for i in test_idx]
+    train_target = dataset_train_target[train_idx]
+    test_target = dataset_test_target[test_idx]
+
+    columns = ["compressor", "pairs_per_second", "accuracy", "peak_memory_kib", "fit_seconds"]
+    print("\t".join(columns))
+
+    for spec in args.compressors:
+        try:
+            compressor = parse_compressor(spec)
+        except ImportError as e:
+            print(f"Skipping {spec}: {e}")
+            continue
+
+        result = benchmark(compressor, train_set, test_set, train_target, test_target, args.k)
+        print("\t".join([
+            result["compressor"],
+            f"{result['pairs_per_second']:.0f}",
+            f"{result['accuracy']:.4f}",
+            f"{result['peak_memory_kib']:.1f}",
+            f"{result['fit_seconds']:.2f}",
+        ]))
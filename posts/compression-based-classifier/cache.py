@@ -0,0 +1,107 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.datasets import fetch_20newsgroups
+from sklearn.feature_extraction.text import CountVectorizer
+
+from compressors import Compressor
+
+default_cache_dir = Path(".cache")
+
+
+def content_hash(*document_sets: list[bytes]) -> str:
+    """
+    Hashes the documents including their boundaries, so the same content split differently hashes differently.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for documents in document_sets:
+        digest.update(len(documents).to_bytes(8, "little"))
+        for document in documents:
+            digest.update(len(document).to_bytes(8, "little"))
+            digest.update(document)
+
+    return digest.hexdigest()
+
+
+def _save_atomic(path: Path, save):
+    # write to a temporary file first, so an interrupted run never leaves a truncated cache entry behind
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    with temporary_path.open("wb") as fp:
+        save(fp)
+
+    temporary_path.replace(path)
+
+
+def load_20newsgroups(subset: str, cache_dir: Path = default_cache_dir) -> tuple[list[bytes], np.ndarray]:
+    """
+    Loads the encoded 20newsgroups documents and targets from a single compact array file.
+
+    :param subset: Either train or test.
+    :param cache_dir: The directory to store the cache in.
+    :return: The encoded documents and their targets.
+    """
+    path = cache_dir / f"20newsgroups.{subset}.npz"
+
+    if not path.exists():
+        newsgroups = fetch_20newsgroups(subset=subset, random_state=123)
+        documents = [document.encode() for document in newsgroups["data"]]
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum([len(document) for document in documents], out=offsets[1:])
+
+        _save_atomic(path, lambda fp: np.savez(
+            fp,
+            data=np.frombuffer(b"".join(documents), dtype=np.uint8),
+            offsets=offsets,
+            target=newsgroups["target"]
+        ))
+
+    with np.load(path) as cached:
+        data = cached["data"].tobytes()
+        offsets = cached["offsets"].tolist()
+        target = cached["target"]
+
+    return [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])], target
+
+
+def compressed_lengths(documents: list[bytes], compressor: Compressor, cache_dir: Path = default_cache_dir) -> np.ndarray:
+    """
+    Returns len(C(x)) for every document, keyed by the compressor (and its level) and the content of the documents.
+    """
+    path = cache_dir / f"lengths.{compressor.cache_key}.{content_hash(documents)}.npy"
+
+    if path.exists():
+        return np.load(path)
+
+    lengths = np.array([compressor.compressed_len(document) for document in documents], dtype=np.int64)
+    _save_atomic(path, lambda fp: np.save(fp, lengths))
+    return lengths
+
+
+def count_vectors(
+        train_set: list[bytes],
+        test_set: list[bytes],
+        cache_dir: Path = default_cache_dir
+) -> tuple[sparse.csr_matrix, sparse.csr_matrix]:
+    """
+    Returns the CountVectorizer matrices of the training and test set, fitted on the training set.
+    """
+    key = content_hash(train_set, test_set)
+    train_path = cache_dir / f"counts.train.{key}.npz"
+    test_path = cache_dir / f"counts.test.{key}.npz"
+
+    if train_path.exists() and test_path.exists():
+        return sparse.load_npz(train_path).tocsr(), sparse.load_npz(test_path).tocsr()
+
+    vectorizer = CountVectorizer()
+    train_count = vectorizer.fit_transform([x2.decode() for x2 in train_set]).tocsr()
+    test_count = vectorizer.transform([x1.decode() for x1 in test_set]).tocsr()
+
+    _save_atomic(train_path, lambda fp: sparse.save_npz(fp, train_count))
+    _save_atomic(test_path, lambda fp: sparse.save_npz(fp, test_count))
+    return train_count, test_count
@@ -0,0 +1,155 @@
+import bz2
+import hashlib
+import lzma
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+
+class Compressor(ABC):
+    """
+    A compressor used to calculate the normalised compression distance.
+    Compressors are pickled into every worker of the process pool, so they only hold plain configuration.
+    """
+
+    name = "compressor"
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    def compressed_len(self, data: bytes) -> int:
+        return len(self.compress(data))
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Identifies the compressor and its configuration for cached compressed lengths.
+        """
+        return self.name
+
+    def fit(self, train_set: list[bytes]):
+        """
+        Prepares the compressor for the training set, e.g. by training a dictionary.
+        """
+        pass
+
+    def prime(self, x1: bytes) -> Callable[[bytes], int]:
+        """
+        Returns a function calculating len(C(" ".join([x1, x2]))) for any x2.
+        Compressors which can copy their state override this to avoid compressing x1 for every pair.
+        """
+        return lambda x2: self.compressed_len(b" ".join([x1, x2]))
+
+
+class ZlibCompressor(Compressor):
+    def __init__(self, level: int = zlib.Z_DEFAULT_COMPRESSION, wbits: int = zlib.MAX_WBITS, name: Optional[str] = None):
+        self.level = level
+        self.wbits = wbits
+        self.name = name or ("zlib" if level == zlib.Z_DEFAULT_COMPRESSION else f"zlib-{level}")
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.wbits)
+        return compressor.compress(data) + compressor.flush()
+
+    def prime(self, x1: bytes) -> Callable[[bytes], int]:
+        # the compressor is primed with x1 once and copied for every pair, so only the x2 suffix is compressed
+        prefix = zlib.compressobj(self.level, zlib.DEFLATED, self.wbits)
+        prefix_length = len(prefix.compress(x1 + b" "))
+
+        def compressed_len(x2: bytes) -> int:
+            compressor = prefix.copy()
+            return prefix_length + len(compressor.compress(x2)) + len(compressor.flush())
+
+        return compressed_len
+
+
+class GzipCompressor(ZlibCompressor):
+    # gzip.compress uses level 9 and a 10 byte header + 8 byte trailer, so does zlib with wbits=31
+    def __init__(self, level: int = 9):
+        super().__init__(level=level, wbits=31, name="gzip" if level == 9 else f"gzip-{level}")
+
+
+class Bz2Compressor(Compressor):
+    def __init__(self, level: int = 9):
+        self.level = level
+        self.name = "bz2" if level == 9 else f"bz2-{level}"
+
+    def compress(self, data: bytes) -> bytes:
+        return bz2.compress(data, compresslevel=self.level)
+
+
+class LzmaCompressor(Compressor):
+    def __init__(self, level: int = 6):
+        self.level = level
+        self.name = "lzma" if level == 6 else f"lzma-{level}"
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.level)
+
+
+class ZstdCompressor(Compressor):
+    """
+    Zstandard with a dictionary trained on the training set, requires the optional zstandard package.
+    """
+
+    def __init__(self, level: int = 3, dict_size: int = 112_640):
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ImportError("The zstd compressor requires the zstandard package, install it with pip install zstandard.")
+
+        self.level = level
+        self.dict_size = dict_size
+        self.dictionary: Optional[bytes] = None
+        self.name = "zstd" if level == 3 else f"zstd-{level}"
+        self._local = threading.local()
+
+    @property
+    def cache_key(self) -> str:
+        if self.dictionary is None:
+            return self.name
+
+        return f"{self.name}.{hashlib.blake2b(self.dictionary, digest_size=8).hexdigest()}"
+
+    def fit(self, train_set: list[bytes]):
+        import zstandard
+
+        self.dictionary = zstandard.train_dictionary(self.dict_size, [bytes(x2) for x2 in train_set]).as_bytes()
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        # zstandard compressors are neither thread-safe nor picklable, so every thread builds its own
+        compressor = getattr(self._local, "compressor", None)
+
+        if compressor is None:
+            import zstandard
+
+            dict_data = zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary is not None else None
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+
+        return compressor.compress(data)
+
+    def __getstate__(self):
+        return {key: value for key, value in self.__dict__.items() if key != "_local"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+
+COMPRESSORS = {
+    "gzip": GzipCompressor,
+    "zlib": ZlibCompressor,
+    "bz2": Bz2Compressor,
+    "lzma": LzmaCompressor,
+    "zstd": ZstdCompressor,
+}
+
+
+def get_compressor(name: str, level: Optional[int] = None) -> Compressor:
+    if name not in COMPRESSORS:
+        raise ValueError(f"Unknown compressor {name}, choose one of {', '.join(COMPRESSORS)}.")
+
+    return COMPRESSORS[name]() if level is None else COMPRESSORS[name](level=level)
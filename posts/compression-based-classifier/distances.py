@@ -1,46 +1,308 @@
-import gzip
+import heapq
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import count
+from multiprocessing.shared_memory import SharedMemory
 from os import cpu_count
+from typing import Iterator, Optional
 
 import numpy as np
+from tqdm import tqdm
 from tqdm.contrib.concurrent import thread_map
-from sklearn.datasets import fetch_20newsgroups
 
+from cache import compressed_lengths, load_20newsgroups
+from compressors import COMPRESSORS, Compressor, GzipCompressor, get_compressor
+from matrix_output import open_distance_matrix, pending_rows
 
-dataset_train = fetch_20newsgroups(subset='train', random_state=123)["data"]
-dataset_test = fetch_20newsgroups(subset='test', random_state=123)["data"]
 
-compressed_train_set = [len(gzip.compress(x2.encode())) for x2 in dataset_train]
-compressed_test_set = [len(gzip.compress(x1.encode())) for x1 in dataset_test]
+compressor: Compressor = GzipCompressor()
+dataset_train: list[bytes] = []
+compressed_train_set: list[int] = []
 
+# populated in every worker of the process pool, see _attach_train_set
+_shared_train_memory: SharedMemory | None = None
 
-def distances(tup: tuple[str, int]) -> list[int]:
+
+def iter_ncd(
+        x1: bytes,
+        Cx1: int,
+        train_set: list,
+        compressed_train: list[int],
+        compressor: Compressor
+) -> Iterator[float]:
+    """
+    Yields the NCD of x1 towards every document in the training set.
+    The compressor is primed with x1 once, for gzip and zlib only the x2 suffix is compressed per pair.
+    """
+    compressed_len = compressor.prime(x1)
+
+    for (x2, Cx2) in zip(train_set, compressed_train):
+        Cx1x2 = compressed_len(x2)
+        yield (Cx1x2 - min(Cx1, Cx2)) / max(Cx1, Cx2)
+
+
+def ncd_row(x1: bytes, Cx1: int, train_set: list, compressed_train: list[int], compressor: Compressor) -> list[float]:
+    return list(iter_ncd(x1, Cx1, train_set, compressed_train, compressor))
+
+
+def ncd_top_k(
+        x1: bytes,
+        Cx1: int,
+        train_set: list,
+        compressed_train: list[int],
+        compressor: Compressor,
+        k: int
+) -> tuple[list[int], list[float]]:
+    """
+    Returns the indices and distances of the k nearest training documents, ordered by distance.
+    Only a bounded heap of k candidates is kept, the full row is never materialised.
+    """
+    nearest = heapq.nsmallest(k, zip(iter_ncd(x1, Cx1, train_set, compressed_train, compressor), count()))
+    return [index for _, index in nearest], [ncd for ncd, _ in nearest]
+
+
+def ncd_top_k_candidates(
+        x1: bytes,
+        Cx1: int,
+        candidates: np.ndarray,
+        train_set: list[bytes],
+        compressed_train: list[int],
+        compressor: Compressor,
+        k: int
+) -> tuple[np.ndarray, list[float]]:
+    """
+    Calculates the NCD towards the candidates only and returns the k nearest training indices and distances.
+    """
+    neighbours, ncd = ncd_top_k(
+        x1,
+        Cx1,
+        [train_set[j] for j in candidates],
+        [compressed_train[j] for j in candidates],
+        compressor,
+        k
+    )
+    return candidates[neighbours], ncd
+
+
+def distances(tup: tuple[bytes, int]) -> list[float]:
     x1, Cx1 = tup
-    distance_from_x1 = []
+    return ncd_row(x1, Cx1, dataset_train, compressed_train_set, compressor)
+
+
+def knn_accuracy(top_k_indices: np.ndarray, train_target: np.ndarray, test_target: np.ndarray) -> float:
+    """
+    Predicts the most common class among the nearest neighbours (as in the paper) and returns the accuracy.
+    Neighbours are ordered by distance, a tie between classes goes to the class of the nearest neighbour.
+    """
+    y_pred = []
+
+    for neighbours in top_k_indices:
+        top_k_class = train_target[neighbours].tolist()
+        # max returns the first maximal element, the classes are in order of their nearest neighbour
+        y_pred.append(max(dict.fromkeys(top_k_class), key=top_k_class.count))
+
+    return float(np.mean(np.array(y_pred) == test_target))
+
+
+def _share_train_set(train_set: list[bytes]) -> tuple[SharedMemory, np.ndarray]:
+    offsets = np.zeros(len(train_set) + 1, dtype=np.int64)
+    np.cumsum([len(x2) for x2 in train_set], out=offsets[1:])
+
+    shared_memory = SharedMemory(create=True, size=max(int(offsets[-1]), 1))
+    for x2, start in zip(train_set, offsets):
+        shared_memory.buf[start:start + len(x2)] = x2
+
+    return shared_memory, offsets
+
+
+def _attach_train_set(name: str, offsets: np.ndarray, compressed_train: list[int], shared_compressor: Compressor):
+    global _shared_train_memory, dataset_train, compressed_train_set, compressor
+
+    compressor = shared_compressor
+    _shared_train_memory = SharedMemory(name=name)
+    # zero-copy views into the shared buffer, the compressors accept any buffer
+    dataset_train = [_shared_train_memory.buf[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    compressed_train_set = compressed_train
 
-    for (x2, Cx2) in zip(dataset_train, compressed_train_set):
-        x1x2 = " ".join([x1, x2])
-        Cx1x2 = len(gzip.compress(x1x2.encode()))
-        ncd = (Cx1x2 - min(Cx1,Cx2)) / max(Cx1, Cx2)
-        distance_from_x1.append(ncd)
 
-    return distance_from_x1
+def distances_shard(shard: tuple[np.ndarray, list[bytes], list[int], Optional[int], Optional[np.ndarray]]):
+    indices, test_set, compressed_test, top_k, candidates = shard
+
+    if top_k is not None and candidates is not None:
+        nearest = [
+            ncd_top_k_candidates(x1, Cx1, row_candidates, dataset_train, compressed_train_set, compressor, top_k)
+            for x1, Cx1, row_candidates in zip(test_set, compressed_test, candidates)
+        ]
+    elif top_k is not None:
+        nearest = [
+            ncd_top_k(x1, Cx1, dataset_train, compressed_train_set, compressor, top_k)
+            for x1, Cx1 in zip(test_set, compressed_test)
+        ]
+
+    if top_k is not None:
+        return indices, (
+            np.array([neighbours for neighbours, _ in nearest], dtype=np.int32),
+            np.array([ncd for _, ncd in nearest], dtype=np.float32)
+        )
+
+    rows = [
+        ncd_row(x1, Cx1, dataset_train, compressed_train_set, compressor)
+        for x1, Cx1 in zip(test_set, compressed_test)
+    ]
+    return indices, np.array(rows, dtype=np.float32)
+
+
+def process_map_distances(
+        rows: np.ndarray,
+        test_set: list[bytes],
+        compressed_test: list[int],
+        max_workers: int,
+        shard_size: int,
+        top_k: Optional[int] = None,
+        candidates: Optional[np.ndarray] = None,
+        train_set: Optional[list[bytes]] = None,
+        compressed_train: Optional[list[int]] = None,
+        shared_compressor: Optional[Compressor] = None
+):
+    """
+    Shards the given test rows into blocks and distributes them over a process pool.
+    The training set is placed in shared memory once instead of being pickled for every worker.
+    Every block is yielded together with its row indices as soon as it finishes.
+
+    :param candidates: With top_k, only these training indices are compared per test row (indexed like test_set).
+    :param train_set: Defaults to the module's dataset_train, likewise compressed_train and shared_compressor.
+    """
+    train_set = dataset_train if train_set is None else train_set
+    compressed_train = compressed_train_set if compressed_train is None else compressed_train
+    shared_compressor = compressor if shared_compressor is None else shared_compressor
+
+    shared_memory, offsets = _share_train_set(train_set)
+    shards = [
+        (
+            indices,
+            [test_set[i] for i in indices],
+            [compressed_test[i] for i in indices],
+            top_k,
+            candidates[indices] if candidates is not None else None
+        )
+        for indices in (rows[start:start + shard_size] for start in range(0, len(rows), shard_size))
+    ]
+
+    try:
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_attach_train_set,
+                initargs=(shared_memory.name, offsets, compressed_train, shared_compressor)
+        ) as executor, tqdm(total=len(rows)) as progress:
+            for future in as_completed([executor.submit(distances_shard, shard) for shard in shards]):
+                indices, block = future.result()
+                yield indices, block
+                progress.update(len(indices))
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
 
 
 if __name__ == "__main__":
     parser = ArgumentParser("Calculate normalised compression distance")
-    parser.add_argument("--max-workers", default=max(32, cpu_count() + 4), type=int)
+    parser.add_argument("--executor", default="thread", choices=["thread", "process"])
+    parser.add_argument("--max-workers", default=None, type=int)
+    parser.add_argument("--shard-size", default=16, type=int, help="Number of test rows per process pool task")
+    parser.add_argument("--compressor", default="gzip", choices=list(COMPRESSORS))
+    parser.add_argument("--level", default=None, type=int, help="Compression level, defaults to the compressor default")
+    parser.add_argument("--output", default=None, help="Defaults to <prefix>.ncd.npy or <prefix>.ncd.top<k>.npz")
+    parser.add_argument("--resume", action="store_true", help="Only compute rows missing from an existing output")
+    parser.add_argument(
+        "--top-k",
+        default=None,
+        type=int,
+        help="Only keep the k nearest training documents per test document and report the kNN accuracy"
+    )
     args = parser.parse_args()
 
+    if args.top_k is not None and args.resume:
+        parser.error("--resume is only supported for the full distance matrix, not with --top-k")
+
+    dataset_train, train_target = load_20newsgroups("train")
+    dataset_test, test_target = load_20newsgroups("test")
+
+    if args.top_k is not None and not 1 <= args.top_k <= len(dataset_train):
+        parser.error(f"--top-k must be between 1 and the {len(dataset_train)} training documents")
+
+    compressor = get_compressor(args.compressor, args.level)
+    compressor.fit(dataset_train)
+    # the default gzip compressor keeps the file names the notebook reads
+    prefix = "20newsgroups" if compressor.name == "gzip" else f"20newsgroups.{compressor.name}"
+
+    compressed_train_set = compressed_lengths(dataset_train, compressor).tolist()
+    compressed_test_set = compressed_lengths(dataset_test, compressor).tolist()
+
     print("Saving training dataset")
-    np.save(f"20newsgroups.train.npy", compressed_train_set)
+    np.save(f"{prefix}.train.npy", compressed_train_set)
     print("Saving test dataset")
-    np.save(f"20newsgroups.test.npy", compressed_test_set)
-
-    print("Calculating NCD")
-    distances = thread_map(distances, zip(dataset_test, compressed_test_set), total=len(dataset_test), max_workers=args.max_workers)
-    
-    print("Stacking")
-    distance_matrix = np.stack(distances)
-    print("Saving NCD")
-    np.save(f"20newsgroups.ncd.npy", distance_matrix)
+    np.save(f"{prefix}.test.npy", compressed_test_set)
+
+    if args.top_k is not None:
+        top_k_indices = np.zeros((len(dataset_test), args.top_k), dtype=np.int32)
+        top_k_distances = np.zeros((len(dataset_test), args.top_k), dtype=np.float32)
+        rows = np.arange(len(dataset_test))
+
+        print(f"Calculating top {args.top_k} NCD for {len(rows)} rows")
+        if args.executor == "process":
+            for indices, (neighbours, ncd) in process_map_distances(
+                rows,
+                dataset_test,
+                compressed_test_set,
+                max_workers=args.max_workers or cpu_count(),
+                shard_size=args.shard_size,
+                top_k=args.top_k
+            ):
+                top_k_indices[indices] = neighbours
+                top_k_distances[indices] = ncd
+        else:
+            def store_top_k(index: int):
+                top_k_indices[index], top_k_distances[index] = ncd_top_k(
+                    dataset_test[index],
+                    compressed_test_set[index],
+                    dataset_train,
+                    compressed_train_set,
+                    compressor,
+                    args.top_k
+                )
+
+            thread_map(store_top_k, rows, max_workers=args.max_workers or max(32, cpu_count() + 4))
+
+        print("Saving top k NCD")
+        np.savez(args.output or f"{prefix}.ncd.top{args.top_k}.npz", indices=top_k_indices, distances=top_k_distances)
+
+        accuracy = knn_accuracy(top_k_indices, train_target, test_target)
+        print(f"kNN accuracy with k={args.top_k}: {accuracy:.4f}")
+    else:
+        distance_matrix, done = open_distance_matrix(
+            args.output or f"{prefix}.ncd.npy",
+            (len(dataset_test), len(dataset_train)),
+            resume=args.resume
+        )
+        rows = pending_rows(done)
+
+        print(f"Calculating NCD for {len(rows)} of {len(dataset_test)} rows")
+        if args.executor == "process":
+            for indices, block in process_map_distances(
+                rows,
+                dataset_test,
+                compressed_test_set,
+                max_workers=args.max_workers or cpu_count(),
+                shard_size=args.shard_size
+            ):
+                distance_matrix[indices] = block
+                done[indices] = True
+        else:
+            def store_distances(index: int):
+                distance_matrix[index] = distances((dataset_test[index], compressed_test_set[index]))
+                done[index] = True
+
+            thread_map(store_distances, rows, max_workers=args.max_workers or max(32, cpu_count() + 4))
+
+        print("Saving NCD")
+        distance_matrix.flush()
+        done.flush()
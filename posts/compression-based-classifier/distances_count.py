@@ -1,50 +1,82 @@
-from collections import defaultdict
+from argparse import ArgumentParser
 
 import numpy as np
-from sklearn.datasets import fetch_20newsgroups
-from sklearn.feature_extraction.text import CountVectorizer
+from scipy import sparse
 from tqdm import tqdm
 
+from cache import count_vectors, load_20newsgroups
+from matrix_output import open_distance_matrix, pending_rows
 
 
-if __name__ == "__main__":
-    dataset_train = fetch_20newsgroups(subset='train', random_state=123)
-    dataset_test = fetch_20newsgroups(subset='test', random_state=123)
-    
-    vectorizer = CountVectorizer()
-    train_dataset_count = vectorizer.fit_transform(dataset_train["data"])
-    test_dataset_count = vectorizer.transform(dataset_test["data"])
-    
+def binarise(count: sparse.csr_matrix) -> sparse.csr_matrix:
+    return (count > 0).astype(np.int32)
+
+
+def count_distance_block(
+        test_binary_block: sparse.csr_matrix,
+        train_binary_t: sparse.csr_matrix,
+        Cx1: np.ndarray,
+        Cx2: np.ndarray
+) -> np.ndarray:
+    """
+    Calculates the normalised count distance of a block of test rows towards every training document.
+    The number of shared tokens of all pairs is the product of the binarised test rows and the transposed training set.
+
+    :param test_binary_block: The binarised count vectors of the test rows.
+    :param train_binary_t: The transposed binarised count vectors of the training set.
+    :param Cx1: The number of tokens of every test row.
+    :param Cx2: The number of tokens of every training document.
+    :return: A dense (rows x train) block of distances.
+    """
+    intersect = (test_binary_block @ train_binary_t).toarray()
+    Cx1 = Cx1[:, np.newaxis]
+    Cx2 = Cx2[np.newaxis, :]
+    Cx1x2 = (Cx1 + Cx2) - intersect
+    return (Cx1x2 - np.minimum(Cx1, Cx2)) / np.maximum(Cx1, Cx2)
+
+
+def token_lengths(count: sparse.csr_matrix) -> np.ndarray:
     # calculate number of tokens per row, this is analogous to len(gzip(...))
-    train_dataset_count_len = train_dataset_count.sum(axis=1).squeeze().tolist()[0]
-    test_dataset_count_len = test_dataset_count.sum(axis=1).squeeze().tolist()[0]
-    
-    # nonzero indexes represents where data is actually stored
-    indices_row_train = defaultdict(set)
-    indices_row_test = defaultdict(set)
-    
-    for row, column in zip(*train_dataset_count.nonzero()):
-        indices_row_train[row].add(column)
-    
-    for row, column in zip(*test_dataset_count.nonzero()):
-        indices_row_test[row].add(column)
+    return np.asarray(count.sum(axis=1)).ravel().astype(np.float64)
+
 
-    count_distances = []
+if __name__ == "__main__":
+    parser = ArgumentParser("Calculate normalised count distance")
+    parser.add_argument("--output", default="20newsgroups.count_distances.npy")
+    parser.add_argument("--block-size", default=512, type=int, help="Number of test rows computed at once")
+    parser.add_argument("--resume", action="store_true", help="Only compute rows missing from an existing output")
+    args = parser.parse_args()
 
-    print("Calculating count distance matrix")
+    dataset_train, _ = load_20newsgroups("train")
+    dataset_test, _ = load_20newsgroups("test")
     
-    for index_x1, Cx1 in tqdm(enumerate(test_dataset_count_len), total=len(test_dataset_count_len)):
-        distance_from_x1 = []
+    train_dataset_count, test_dataset_count = count_vectors(dataset_train, dataset_test)
     
-        for index_x2, Cx2 in enumerate(train_dataset_count_len):
-            intersect = indices_row_test[index_x1].intersection(indices_row_train[index_x2])
-            Cx1x2 = (Cx1 + Cx2) - len(intersect)
-            nd = (Cx1x2 - min(Cx1,Cx2)) / max(Cx1, Cx2)
-            distance_from_x1.append(nd)
+    train_dataset_count_len = token_lengths(train_dataset_count)
+    test_dataset_count_len = token_lengths(test_dataset_count)
     
-        count_distances.append(distance_from_x1)
+    train_dataset_binary_t = binarise(train_dataset_count).T.tocsr()
+    test_dataset_binary = binarise(test_dataset_count)
+
+    count_matrix, done = open_distance_matrix(
+        args.output,
+        (len(test_dataset_count_len), len(train_dataset_count_len)),
+        resume=args.resume
+    )
+    rows = pending_rows(done)
+
+    print(f"Calculating count distance matrix for {len(rows)} of {len(test_dataset_count_len)} rows")
+
+    for start in tqdm(range(0, len(rows), args.block_size)):
+        block = rows[start:start + args.block_size]
+        count_matrix[block] = count_distance_block(
+            test_dataset_binary[block],
+            train_dataset_binary_t,
+            test_dataset_count_len[block],
+            train_dataset_count_len
+        )
+        done[block] = True
 
-    print("Stacking")
-    count_matrix = np.stack(count_distances)
     print("Saving count distances")
-    np.save(f"20newsgroups.count_distances.npy", count_matrix)
+    count_matrix.flush()
+    done.flush()
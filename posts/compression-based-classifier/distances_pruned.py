@@ -0,0 +1,157 @@
+from argparse import ArgumentParser
+from os import cpu_count
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from tqdm import tqdm
+
+from cache import compressed_lengths, count_vectors, load_20newsgroups
+from compressors import COMPRESSORS, get_compressor
+from distances import knn_accuracy, process_map_distances
+from distances_count import binarise, count_distance_block, token_lengths
+
+
+def count_candidates(
+        test_count: sparse.csr_matrix,
+        train_count: sparse.csr_matrix,
+        n_candidates: int,
+        block_size: int = 512
+) -> np.ndarray:
+    """
+    Picks the n_candidates nearest training documents for every test document using the normalised count distance.
+
+    :param test_count: The count vectors of the test set.
+    :param train_count: The count vectors of the training set.
+    :param n_candidates: The number of candidates to keep per test document.
+    :param block_size: Number of test rows computed at once.
+    :return: A (test x n_candidates) array of training indices, in no particular order.
+    """
+    n_test, n_train = test_count.shape[0], train_count.shape[0]
+
+    if n_candidates >= n_train:
+        return np.broadcast_to(np.arange(n_train, dtype=np.int32), (n_test, n_train))
+
+    train_binary_t = binarise(train_count).T.tocsr()
+    test_binary = binarise(test_count)
+    train_len = token_lengths(train_count)
+    test_len = token_lengths(test_count)
+    candidates = np.empty((n_test, n_candidates), dtype=np.int32)
+
+    for start in tqdm(range(0, n_test, block_size)):
+        stop = min(start + block_size, n_test)
+        nd = count_distance_block(test_binary[start:stop], train_binary_t, test_len[start:stop], train_len)
+        candidates[start:stop] = np.argpartition(nd, n_candidates - 1, axis=1)[:, :n_candidates]
+
+    return candidates
+
+
+def exact_top_k(path: Path, rows: np.ndarray, k: int) -> np.ndarray:
+    """
+    Reads the exact k nearest neighbours of the given rows, either from a full NCD matrix (.npy)
+    or from the output of distances.py --top-k (.npz).
+    """
+    if path.suffix == ".npz":
+        with np.load(path) as top_k:
+            return top_k["indices"][rows, :k]
+
+    matrix = np.load(path, mmap_mode="r")
+    return np.array([np.argsort(matrix[row], kind="stable")[:k] for row in rows])
+
+
+def recall(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Returns the fraction of exact neighbours which are also found by the approximation, averaged over all rows.
+    """
+    return float(np.mean([
+        len(set(a.tolist()).intersection(e.tolist())) / len(e)
+        for a, e in zip(approximate, exact)
+    ]))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Calculate the k nearest neighbours by NCD on candidates prefiltered by count distance")
+    parser.add_argument("--top-k", default=2, type=int)
+    parser.add_argument("--candidates", default=100, type=int, help="Number of count distance candidates per test document")
+    parser.add_argument("--compressor", default="gzip", choices=list(COMPRESSORS))
+    parser.add_argument("--level", default=None, type=int, help="Compression level, defaults to the compressor default")
+    parser.add_argument("--block-size", default=512, type=int, help="Number of test rows per count distance block")
+    parser.add_argument("--max-workers", default=cpu_count(), type=int, help="Processes computing the NCD")
+    parser.add_argument("--shard-size", default=16, type=int, help="Number of test rows per process pool task")
+    parser.add_argument("--exact", default=None, type=Path, help="Exact NCD matrix (.npy) or top k file (.npz) to compare to")
+    parser.add_argument(
+        "--recall-sample",
+        default=100,
+        type=int,
+        help="Without --exact, the number of test documents to calculate the exact neighbours for"
+    )
+    parser.add_argument("--seed", default=123, type=int)
+    parser.add_argument("--output", default=None, help="Defaults to <prefix>.ncd.top<k>.pruned<candidates>.npz")
+    args = parser.parse_args()
+
+    dataset_train, train_target = load_20newsgroups("train")
+    dataset_test, test_target = load_20newsgroups("test")
+
+    compressor = get_compressor(args.compressor, args.level)
+    compressor.fit(dataset_train)
+    prefix = "20newsgroups" if compressor.name == "gzip" else f"20newsgroups.{compressor.name}"
+
+    compressed_train_set = compressed_lengths(dataset_train, compressor).tolist()
+    compressed_test_set = compressed_lengths(dataset_test, compressor).tolist()
+    train_dataset_count, test_dataset_count = count_vectors(dataset_train, dataset_test)
+
+    print(f"Selecting {args.candidates} candidates by count distance")
+    candidates = count_candidates(test_dataset_count, train_dataset_count, args.candidates, args.block_size)
+
+    top_k_indices = np.zeros((len(dataset_test), args.top_k), dtype=np.int32)
+    top_k_distances = np.zeros((len(dataset_test), args.top_k), dtype=np.float32)
+
+    # the training set goes to the worker processes through shared memory, like in distances.py --executor process
+    train = {"train_set": dataset_train, "compressed_train": compressed_train_set, "shared_compressor": compressor}
+
+    print(f"Calculating top {args.top_k} NCD on candidates")
+    for indices, (neighbours, ncd) in process_map_distances(
+        np.arange(len(dataset_test)),
+        dataset_test,
+        compressed_test_set,
+        max_workers=args.max_workers,
+        shard_size=args.shard_size,
+        top_k=args.top_k,
+        candidates=candidates,
+        **train
+    ):
+        top_k_indices[indices] = neighbours
+        top_k_distances[indices] = ncd
+
+    print("Saving pruned top k NCD")
+    np.savez(
+        args.output or f"{prefix}.ncd.top{args.top_k}.pruned{args.candidates}.npz",
+        indices=top_k_indices,
+        distances=top_k_distances
+    )
+
+    if args.exact is not None:
+        rows = np.arange(len(dataset_test))
+        exact = exact_top_k(args.exact, rows, args.top_k)
+    else:
+        rows = np.random.default_rng(args.seed).choice(len(dataset_test), size=args.recall_sample, replace=False)
+        print(f"Calculating exact top {args.top_k} NCD for {len(rows)} sampled rows")
+        exact_indices = np.zeros((len(dataset_test), args.top_k), dtype=np.int32)
+        for indices, (neighbours, _) in process_map_distances(
+            rows,
+            dataset_test,
+            compressed_test_set,
+            max_workers=args.max_workers,
+            shard_size=args.shard_size,
+            top_k=args.top_k,
+            **train
+        ):
+            exact_indices[indices] = neighbours
+        exact = exact_indices[rows]
+
+    pairs_total = len(dataset_test) * len(dataset_train)
+    pairs_pruned = len(dataset_test) * candidates.shape[1]
+    print(f"Compressed {pairs_pruned} of {pairs_total} pairs ({pairs_total / pairs_pruned:.1f}x fewer)")
+    print(f"Candidate recall@{args.top_k}: {recall(candidates[rows], exact):.4f}")
+    print(f"Top {args.top_k} recall: {recall(top_k_indices[rows], exact):.4f}")
+    print(f"kNN accuracy with k={args.top_k}: {knn_accuracy(top_k_indices, train_target, test_target):.4f}")
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import numpy as np
+
+
+def done_mask_path(path: str | Path) -> Path:
+    """
+    Returns the path of the .npy file next to a distance matrix which records the rows written so far.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.stem}.done.npy")
+
+
+def open_distance_matrix(path: str | Path, shape: tuple[int, int], resume: bool = False) -> tuple[np.memmap, np.memmap]:
+    """
+    Opens a float32 .npy file as a memory map so that rows can be written as soon as they are computed,
+    together with a boolean mask in a .npy file beside it in which finished rows are marked.
+    A row only counts as computed once its mask entry is set, so no value of the matrix itself is reserved as a marker.
+
+    :param path: The .npy file to write.
+    :param shape: The shape of the distance matrix (test x train).
+    :param resume: Reopen an existing file and its mask instead of overwriting them.
+    :return: The writable memory maps of the matrix and of the mask.
+    """
+    path = Path(path)
+    mask_path = done_mask_path(path)
+
+    if resume and path.exists():
+        if not mask_path.exists():
+            raise ValueError(f"Can't resume {path} without {mask_path}, which records the finished rows.")
+        matrix = np.lib.format.open_memmap(path, mode="r+")
+        done = np.lib.format.open_memmap(mask_path, mode="r+")
+        if matrix.shape != shape or matrix.dtype != np.float32:
+            raise ValueError(f"Can't resume {path} with shape {matrix.shape} and dtype {matrix.dtype}, expected {shape} float32.")
+        if done.shape != shape[:1] or done.dtype != np.bool_:
+            raise ValueError(f"Can't resume with {mask_path} of shape {done.shape} and dtype {done.dtype}, expected {shape[:1]} bool.")
+        return matrix, done
+
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+    done = np.lib.format.open_memmap(mask_path, mode="w+", dtype=np.bool_, shape=shape[:1])
+    done[:] = False
+    done.flush()
+    return matrix, done
+
+
+def pending_rows(done: np.ndarray) -> np.ndarray:
+    """
+    Returns the indices of all rows not marked as done, e.g. because the run crashed before writing them.
+    """
+    return np.flatnonzero(~np.asarray(done))
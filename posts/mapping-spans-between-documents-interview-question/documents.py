@@ -0,0 +1,179 @@
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+from span_mapping import DocumentIndex, UnitArrays, as_unit_arrays
+
+
+class Spans(NamedTuple):
+    ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    sentences: np.ndarray  # the id of the sentence a span belongs to
+
+
+def compact(values: np.ndarray) -> np.ndarray:
+    """
+    Stores the values as int32 if they fit, else as int64.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    fits = not len(values) or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max)
+    return values.astype(np.int32) if fits else values
+
+
+class Document(NamedTuple):
+    """
+    The sentences and spans of a document as columns of integers instead of one tuple per unit.
+    Spans are sorted by sentence, so span_indptr indexes the spans of every sentence (CSR-style)
+    and the spans of a sentence are slices of the columns, not copies.
+    Indexing a Document like the (sentences, spans) tuples of the examples also works with span_mapping.
+    """
+    sentences: UnitArrays
+    spans: Spans
+    span_indptr: np.ndarray  # the spans of the i-th sentence are the rows span_indptr[i]:span_indptr[i + 1]
+
+    @classmethod
+    def from_units(
+            cls,
+            sentences: Union[UnitArrays, Sequence[tuple[int, ...]]],
+            spans: Union[Spans, Sequence[tuple[int, ...]]]
+    ) -> "Document":
+        """
+        :param sentences: Sentence tuples (id, start, end) or their columns, in any order.
+        :param spans: Span tuples (id, start, end, sentence) or their columns, in any order.
+        """
+        sentences = as_unit_arrays(sentences)
+        if not isinstance(spans, Spans):
+            spans = Spans(*np.array(spans, dtype=np.int64).reshape(-1, 4).T)
+
+        order = np.argsort(sentences.starts, kind="stable")
+        sentences = UnitArrays(*(compact(column[order]) for column in sentences))
+
+        # the position of every span's sentence, spans are sorted by it and within a sentence by start
+        by_id = np.argsort(sentences.ids)
+        rows = by_id[np.minimum(np.searchsorted(sentences.ids, spans.sentences, sorter=by_id), max(len(by_id) - 1, 0))]
+        if len(spans.ids) and (not len(by_id) or np.any(sentences.ids[rows] != spans.sentences)):
+            raise ValueError("Spans refer to sentences which are not part of the document")
+
+        order = np.lexsort((spans.starts, rows))
+        spans = Spans(*(compact(column[order]) for column in spans))
+        span_indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(sentences.ids)))])
+        return cls(sentences, spans, span_indptr.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.sentences.ids)
+
+    def sentence_spans(self, row: int) -> Spans:
+        """
+        Returns views of the spans of the sentence at the given row (sentences are sorted by start).
+        """
+        start, stop = self.span_indptr[row], self.span_indptr[row + 1]
+        return Spans(*(column[start:stop] for column in self.spans))
+
+    def sentence_slice(self, rows: slice) -> "Document":
+        """
+        Returns views of a consecutive run of sentences and their spans as a document of its own.
+        """
+        first, last, _ = rows.indices(len(self))
+        start, stop = self.span_indptr[first], self.span_indptr[max(last, first)]
+        return Document(
+            UnitArrays(*(column[first:last] for column in self.sentences)),
+            Spans(*(column[start:stop] for column in self.spans)),
+            self.span_indptr[first:max(last, first) + 1] - start
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (*self.sentences, *self.spans, self.span_indptr))
+
+    def save(self, directory: Path):
+        """
+        Writes every column to its own .npy file, which load can memory-map.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for prefix, columns in [("sentence", self.sentences), ("span", self.spans)]:
+            for name, column in zip(columns._fields, columns):
+                np.save(directory / f"{prefix}_{name}.npy", column)
+        np.save(directory / "span_indptr.npy", self.span_indptr)
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[str] = "r") -> "Document":
+        """
+        :param directory: A directory written by save.
+        :param mmap_mode: Memory-maps the columns by default, so only the pages that are read are loaded.
+            None reads them into memory.
+        """
+        def column(name: str) -> np.ndarray:
+            return np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+
+        return cls(
+            UnitArrays(*(column(f"sentence_{name}") for name in UnitArrays._fields)),
+            Spans(*(column(f"span_{name}") for name in Spans._fields)),
+            column("span_indptr")
+        )
+
+
+def random_document(n_sentences: int, spans_per_sentence: int, rng: np.random.Generator) -> Document:
+    """
+    A text of consecutive sentences, each split into a random number of consecutive spans of 1 to 9 positions.
+    """
+    counts = rng.integers(1, 2 * spans_per_sentence, size=n_sentences)
+    lengths = rng.integers(1, 10, size=counts.sum())
+    ends = np.cumsum(lengths) - 1
+    span_sentences = np.repeat(np.arange(n_sentences), counts)
+    last_spans = np.cumsum(counts) - 1
+    sentence_ends = ends[last_spans]
+    sentence_starts = np.concatenate([[0], sentence_ends[:-1] + 1])
+    return Document.from_units(
+        UnitArrays(np.arange(n_sentences), sentence_starts, sentence_ends),
+        Spans(np.arange(len(lengths)), ends - lengths + 1, ends, span_sentences)
+    )
+
+
+if __name__ == "__main__":
+    doc_a = Document.from_units(
+        [(1, 11, 20), (0, 0, 10)],
+        [(3, 16, 20, 1), (0, 0, 5, 0), (2, 11, 15, 1), (1, 6, 10, 0)]
+    )
+    assert doc_a.sentences.ids.tolist() == [0, 1]
+    assert doc_a.span_indptr.tolist() == [0, 2, 4]
+    assert doc_a.sentence_spans(1).ids.tolist() == [2, 3]
+    assert np.shares_memory(doc_a.sentence_spans(1).starts, doc_a.spans.starts)
+    assert doc_a.sentence_slice(slice(1, 2)).span_indptr.tolist() == [0, 2]
+    assert doc_a.spans.ids.dtype == np.int32
+
+    doc_b = Document.from_units([(0, 0, 7), (1, 8, 20)], [(0, 0, 5, 0), (1, 6, 7, 0), (2, 8, 15, 1), (3, 16, 20, 1)])
+    sentences, spans = DocumentIndex.build(doc_a).map(doc_b)
+    assert (sentences.tolist(), spans.tolist()) == ([0, 0], [0, 1, 1, 3])
+
+    try:
+        Document.from_units([(0, 0, 10)], [(0, 0, 5, 1)])
+        raise AssertionError("A span of a missing sentence must be rejected")
+    except ValueError:
+        pass
+
+    rng = np.random.default_rng(0)
+    document = random_document(200_000, 10, rng)
+    n_spans = len(document.spans.ids)
+
+    tracemalloc.start()
+    from example_c import Span  # also runs the example's asserts
+    tuples = [Span(*unit) for unit in zip(*(column.tolist() for column in document.spans))]
+    tuple_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tuples
+    print(f"{n_spans:,} spans take {document.nbytes / 2 ** 20:.0f}MB as columns, {tuple_bytes / 2 ** 20:.0f}MB as Span tuples")
+
+    with tempfile.TemporaryDirectory() as directory:
+        document.save(Path(directory))
+        start = time.perf_counter()
+        loaded = Document.load(Path(directory))
+        spans = loaded.sentence_spans(123_456)
+        print(f"Memory-mapped the document and read one sentence's {len(spans.ids)} spans in {(time.perf_counter() - start) * 1000:.1f}ms")
+        assert isinstance(loaded.spans.starts, np.memmap)
+        assert (spans.ids == document.sentence_spans(123_456).ids).all()
+        assert (DocumentIndex.build(loaded).spans.containing(document.spans) == document.spans.ids).all()
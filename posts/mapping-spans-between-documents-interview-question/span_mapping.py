@@ -0,0 +1,278 @@
+import pickle
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal, NamedTuple, Optional, Sequence, Union, get_args
+
+import numpy as np
+
+How = Literal["first", "overlap", "containment"]
+
+
+class UnitArrays(NamedTuple):
+    ids: np.ndarray  # the unique identifiers of the units
+    starts: np.ndarray  # the start index of every unit
+    ends: np.ndarray  # the end index of every unit
+
+
+Units = Union[UnitArrays, Sequence[tuple[int, ...]]]
+
+
+class Overlaps(NamedTuple):
+    indptr: np.ndarray  # the units of a overlapping unit i of b are ids[indptr[i]:indptr[i + 1]]
+    ids: np.ndarray
+    lengths: np.ndarray  # the number of positions both units share
+
+
+def as_unit_arrays(units: Units) -> UnitArrays:
+    """
+    Converts a list of units (e.g. Sentence or Span tuples, starting with id, start, end) to arrays.
+    """
+    if isinstance(units, UnitArrays):
+        return units
+    if hasattr(units, "starts"):
+        # columns with further ones, like documents.Spans
+        return UnitArrays(units.ids, units.starts, units.ends)
+    if not len(units):
+        return UnitArrays(*np.empty((3, 0), dtype=np.int64))
+
+    table = np.array(units, dtype=np.int64)
+    return UnitArrays(table[:, 0], table[:, 1], table[:, 2])
+
+
+def search(values: np.ndarray, queries: np.ndarray, order: Optional[np.ndarray], side: str = "left") -> np.ndarray:
+    """
+    np.searchsorted, but looks the queries up in the given sorted order, binary searches for ascending queries
+    hit the same cache lines over and over, which is many times faster than looking them up in random order.
+    """
+    if order is None:
+        return np.searchsorted(values, queries, side=side)
+
+    found = np.empty(len(queries), dtype=np.intp)
+    found[order] = np.searchsorted(values, queries[order], side=side)
+    return found
+
+
+def ascending(values: np.ndarray) -> bool:
+    return bool(np.all(values[1:] >= values[:-1]))
+
+
+class UnitIndex:
+    """
+    The units of a base document sorted by start, built once and queried with any number of other documents.
+    All arrays are read-only after construction, so one index can be shared between threads,
+    and it pickles (or saves to an .npz file) as plain arrays to be cached between requests.
+    """
+
+    def __init__(self, units: Units, inclusive: bool = True):
+        """
+        :param units: The units to map onto, in any order.
+        :param inclusive: Whether the end index belongs to a unit, otherwise units are half-open.
+        """
+        units = as_unit_arrays(units)
+        order = slice(None) if ascending(units.starts) else np.argsort(units.starts, kind="stable")
+        self.__setstate__({
+            "inclusive": inclusive,
+            "ids": units.ids[order],
+            "starts": units.starts[order],
+            "ends": (units.ends if inclusive else units.ends - 1)[order]
+        })
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getstate__(self) -> dict:
+        # the ends are stored inclusive either way
+        return {"inclusive": self.inclusive, "ids": self.ids, "starts": self.starts, "ends": self.ends}
+
+    def __setstate__(self, state: dict):
+        self.inclusive = bool(state["inclusive"])
+        # copies, so nobody holding the original arrays can change the index
+        self.ids, self.starts, self.ends = (np.array(state[name], dtype=np.int64) for name in ("ids", "starts", "ends"))
+        # the latest end so far, units may overlap, so it's the first unit reaching past a position
+        self.reach = np.maximum.accumulate(self.ends)
+        # of the units up to a position the one reaching furthest, the candidate to contain anything starting there
+        self.furthest = np.maximum.accumulate(np.where(self.ends == self.reach, np.arange(len(self.ends)), 0))
+
+        for array in (self.ids, self.starts, self.ends, self.reach, self.furthest):
+            array.flags.writeable = False
+
+    def save(self, file: Path):
+        np.savez(file, **self.__getstate__())
+
+    @classmethod
+    def load(cls, file: Path) -> "UnitIndex":
+        index = cls.__new__(cls)
+        with np.load(file) as stored:
+            index.__setstate__(dict(stored))
+        return index
+
+    def queries(self, units: Units) -> tuple[UnitArrays, np.ndarray, Optional[np.ndarray]]:
+        """
+        Returns the units with inclusive ends and the order to look them up in.
+        """
+        units = as_unit_arrays(units)
+        ends = units.ends if self.inclusive else units.ends - 1
+        return units, ends, None if ascending(units.starts) else np.argsort(units.starts)
+
+    def first(self, units: Units) -> np.ndarray:
+        """
+        Returns the id of the first unit (by start) ending at or after the start of every given unit, as in example_a,
+        -1 where there is none.
+        """
+        units, _, order = self.queries(units)
+        if not len(self):
+            return np.full(len(units.ids), -1)
+
+        first = search(self.reach, units.starts, order, side="left")
+        return np.where(first < len(self), self.ids[np.minimum(first, len(self) - 1)], -1)
+
+    def containing(self, units: Units) -> np.ndarray:
+        """
+        Returns the id of a unit containing the whole of every given unit, -1 where there is none.
+        """
+        units, ends, order = self.queries(units)
+        if not len(self):
+            return np.full(len(units.ids), -1)
+
+        # the last unit starting at or before the given one, and of the units up to it, the one reaching furthest
+        last = search(self.starts, units.starts, order, side="right") - 1
+        furthest = self.furthest[np.maximum(last, 0)]
+        return np.where((last >= 0) & (self.ends[furthest] >= ends), self.ids[furthest], -1)
+
+    def overlapping(self, units: Units) -> Overlaps:
+        """
+        Returns all units sharing at least one position with each of the given units, by start,
+        with the number of positions they share.
+        """
+        units, ends, order = self.queries(units)
+
+        # every unit from the first reaching the given one up to the last starting within it, which also still ends in it
+        first = search(self.reach, units.starts, order, side="left")
+        stop = search(self.starts, ends, order, side="right")
+        counts = np.maximum(stop - first, 0)
+        owners = np.repeat(np.arange(len(units.ids)), counts)
+        positions = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        overlap = np.minimum(self.ends[positions], ends[owners]) - np.maximum(self.starts[positions], units.starts[owners]) + 1
+        overlapping = overlap > 0
+        owners, positions = owners[overlapping], positions[overlapping]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=len(units.ids)))])
+        return Overlaps(indptr, self.ids[positions], overlap[overlapping])
+
+    def map(self, units: Units, how: How = "first") -> Union[np.ndarray, Overlaps]:
+        if how == "first":
+            return self.first(units)
+        if how == "containment":
+            return self.containing(units)
+        if how == "overlap":
+            return self.overlapping(units)
+        raise ValueError(f"Unknown mapping {how!r}, expected one of {', '.join(get_args(How))}")
+
+
+class DocumentIndex(NamedTuple):
+    """
+    The sentence and span indexes of a base document, to map many revisions of it onto.
+    """
+    sentences: UnitIndex
+    spans: UnitIndex
+
+    @classmethod
+    def build(cls, document: tuple[Units, Units], inclusive: bool = True) -> "DocumentIndex":
+        return cls(UnitIndex(document[0], inclusive), UnitIndex(document[1], inclusive))
+
+    def map(self, document: tuple[Units, Units], how: How = "first") -> tuple[Union[np.ndarray, Overlaps], Union[np.ndarray, Overlaps]]:
+        return self.sentences.map(document[0], how), self.spans.map(document[1], how)
+
+
+def map_units(document_a: Units, document_b: Units, how: How = "first", inclusive: bool = True) -> Union[np.ndarray, Overlaps]:
+    """
+    Maps every unit of document_b onto the units of document_a. Neither document has to be sorted,
+    the units of a are sorted once and all units of b are looked up at once with binary searches.
+    To map several documents onto the same one, build its UnitIndex once instead.
+
+    :param document_a: The units to map onto.
+    :param document_b: The units to map.
+    :param how: first: the first unit of a (by start) ending at or after the start of the b unit, as in example_a,
+        overlap: all units of a overlapping the b unit,
+        containment: a unit of a which contains the whole b unit.
+    :param inclusive: Whether the end index belongs to a unit, otherwise units are half-open.
+    :return: For first and containment the id of the a unit for every unit of b, -1 where there is none,
+        for overlap the ids of all overlapping a units per unit of b and the lengths of the overlaps.
+    """
+    return UnitIndex(document_a, inclusive).map(document_b, how)
+
+
+def map_documents(
+        document_a: tuple[Units, Units],
+        document_b: tuple[Units, Units],
+        how: How = "first",
+        inclusive: bool = True
+) -> tuple[Union[np.ndarray, Overlaps], Union[np.ndarray, Overlaps]]:
+    """
+    Maps the sentences and spans of document_b onto those of document_a, see map_units.
+    """
+    return DocumentIndex.build(document_a, inclusive).map(document_b, how)
+
+
+def random_document(n_units: int, rng: np.random.Generator, max_length: int = 10) -> UnitArrays:
+    """
+    Splits a text into n_units consecutive units of random length, with inclusive ends.
+    """
+    lengths = rng.integers(1, max_length, size=n_units)
+    ends = np.cumsum(lengths) - 1
+    return UnitArrays(np.arange(n_units), ends - lengths + 1, ends)
+
+
+if __name__ == "__main__":
+    doc_a = [(0, 0, 10), (1, 11, 20), (2, 21, 30)]
+    doc_b = [(0, 0, 10), (1, 11, 15), (2, 16, 19), (3, 20, 30)]
+    assert map_units(doc_a, doc_b).tolist() == [0, 1, 1, 1]
+    assert map_units(doc_a[::-1], doc_b[::-1]).tolist() == [1, 1, 1, 0]
+    assert map_units(doc_a, doc_b, "containment").tolist() == [0, 1, 1, -1]
+    overlaps = map_units(doc_a, doc_b, "overlap")
+    assert [overlaps.ids[start:stop].tolist() for start, stop in zip(overlaps.indptr, overlaps.indptr[1:])] == [[0], [1], [1], [1, 2]]
+    assert overlaps.lengths.tolist() == [11, 5, 4, 1, 10]
+    assert map_units(doc_a, doc_b, "overlap", inclusive=False).lengths.tolist() == [10, 4, 3, 9]
+    assert map_units([], doc_b).tolist() == [-1, -1, -1, -1]
+    assert map_units(doc_a, []).tolist() == []
+
+    doc_a = (
+        [(0, 0, 10), (1, 11, 20)],
+        [(0, 0, 5, 0), (1, 6, 10, 0), (2, 11, 15, 1), (3, 16, 20, 1)]
+    )
+    doc_b = (
+        [(0, 0, 7), (1, 8, 20)],
+        [(0, 0, 5, 0), (1, 6, 7, 0), (2, 8, 15, 1), (3, 16, 20, 1)]
+    )
+    sentences, spans = map_documents(doc_a, doc_b)
+    assert (sentences.tolist(), spans.tolist()) == ([0, 0], [0, 1, 1, 3])
+
+    rng = np.random.default_rng(0)
+    a, b = random_document(1_000_000, rng), random_document(1_000_000, rng)
+    for how in ("first", "containment", "overlap"):
+        start = time.perf_counter()
+        map_units(a, b, how)
+        print(f"Mapped 1M units onto 1M units by {how} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    shuffled_a, shuffled_b = (UnitArrays(*(column[order] for column in document)) for document, order in [
+        (a, rng.permutation(len(a.ids))), (b, rng.permutation(len(b.ids)))
+    ])
+    start = time.perf_counter()
+    map_units(shuffled_a, shuffled_b)
+    print(f"Mapped 1M shuffled units onto 1M shuffled units in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # one index for the base document, shared by the threads mapping its revisions
+    index = UnitIndex(a)
+    revisions = [random_document(1_000_000, rng) for _ in range(4)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor() as executor:
+        mapped = list(executor.map(index.overlapping, revisions))
+    print(f"Mapped {len(revisions)} revisions onto one index in {(time.perf_counter() - start) * 1000:.1f}ms")
+    assert all((overlaps.ids == map_units(a, revision, "overlap").ids).all() for overlaps, revision in zip(mapped, revisions))
+
+    assert (pickle.loads(pickle.dumps(index)).overlapping(b).lengths == index.overlapping(b).lengths).all()
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(Path(directory) / "index.npz")
+        assert (UnitIndex.load(Path(directory) / "index.npz").containing(b) == index.containing(b)).all()
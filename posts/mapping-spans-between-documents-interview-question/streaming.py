@@ -0,0 +1,230 @@
+import json
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from itertools import chain
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from documents import Document, random_document
+from span_mapping import How, UnitArrays, as_unit_arrays, map_units as map_units_in_memory
+
+
+class Unit(NamedTuple):
+    id: int
+    start: int
+    end: int  # inclusive
+    reach: int  # the latest end of this and all previous units
+
+
+class SortedUnits:
+    """
+    A lookahead of one unit over an iterator of units sorted by start, which tracks how far the units reach.
+    """
+
+    def __init__(self, units: Iterable[tuple[int, ...]], inclusive: bool, name: str):
+        self.units = iter(units)
+        self.inclusive = inclusive
+        self.name = name
+        self.reach: Optional[int] = None
+        self.start: Optional[int] = None
+        self.next: Optional[Unit] = None
+        self.advance()
+
+    def advance(self):
+        unit = next(self.units, None)
+        if unit is None:
+            self.next = None
+            return
+
+        id_, start, end = int(unit[0]), int(unit[1]), int(unit[2]) - (not self.inclusive)
+        if self.start is not None and start < self.start:
+            raise ValueError(f"The units of {self.name} are not sorted by start, {start} follows {self.start}")
+
+        self.start = start
+        self.reach = end if self.reach is None else max(self.reach, end)
+        self.next = Unit(id_, start, end, self.reach)
+
+    def pop(self) -> Unit:
+        unit = self.next
+        self.advance()
+        return unit
+
+
+def first(a: SortedUnits, b: SortedUnits) -> Iterator[tuple[int, int]]:
+    # the first unit of a reaching the start of the current b unit, b starts only grow, so earlier ones are done
+    candidate = None
+    while b.next is not None:
+        unit = b.pop()
+        while (candidate is None or candidate.reach < unit.start) and a.next is not None:
+            candidate = a.pop()
+        yield unit.id, candidate.id if candidate is not None and candidate.reach >= unit.start else -1
+
+
+def containing(a: SortedUnits, b: SortedUnits) -> Iterator[tuple[int, int]]:
+    # of all units of a starting at or before the current b unit, the one reaching furthest
+    furthest = None
+    while b.next is not None:
+        unit = b.pop()
+        while a.next is not None and a.next.start <= unit.start:
+            candidate = a.pop()
+            if candidate.end == candidate.reach:
+                furthest = candidate
+        yield unit.id, furthest.id if furthest is not None and furthest.end >= unit.end else -1
+
+
+def overlapping(a: SortedUnits, b: SortedUnits) -> Iterator[tuple[int, int]]:
+    # the units of a from the first reaching the current b unit up to the last starting within any b unit so far
+    window: deque[Unit] = deque()
+    while b.next is not None:
+        unit = b.pop()
+        while window and window[0].reach < unit.start:
+            window.popleft()
+        while a.next is not None and a.next.start <= unit.end:
+            candidate = a.pop()
+            if candidate.reach >= unit.start:
+                window.append(candidate)
+
+        for candidate in window:
+            if candidate.start > unit.end:
+                break
+            if min(candidate.end, unit.end) >= max(candidate.start, unit.start):
+                yield unit.id, candidate.id
+
+
+def map_units(
+        units_a: Iterable[tuple[int, ...]],
+        units_b: Iterable[tuple[int, ...]],
+        how: How = "first",
+        inclusive: bool = True
+) -> Iterator[tuple[int, int]]:
+    """
+    Maps units of b onto units of a like span_mapping.map_units, but reads both lazily, one unit at a time.
+    Both must be sorted by start. Only the units of a which may still overlap a unit of b are kept.
+
+    :param units_a: The units to map onto, tuples starting with id, start, end.
+    :param units_b: The units to map.
+    :param how: See span_mapping.map_units.
+    :param inclusive: Whether the end index belongs to a unit, otherwise units are half-open.
+    :return: Pairs of the id of the b unit and the id of an a unit. For first and containment exactly one per b unit,
+        with -1 if there is none, for overlap one per overlapping a unit.
+    """
+    mappings = {"first": first, "containment": containing, "overlap": overlapping}
+    if how not in mappings:
+        raise ValueError(f"Unknown mapping {how!r}, expected one of {', '.join(mappings)}")
+
+    return mappings[how](SortedUnits(units_a, inclusive, "a"), SortedUnits(units_b, inclusive, "b"))
+
+
+def map_documents(
+        document_a: tuple[Iterable[tuple[int, ...]], Iterable[tuple[int, ...]]],
+        document_b: tuple[Iterable[tuple[int, ...]], Iterable[tuple[int, ...]]],
+        how: How = "first",
+        inclusive: bool = True
+) -> tuple[Iterator[tuple[int, int]], Iterator[tuple[int, int]]]:
+    """
+    Lazily maps the sentences and spans of document_b onto those of document_a, see map_units.
+    """
+    return (
+        map_units(document_a[0], document_b[0], how, inclusive),
+        map_units(document_a[1], document_b[1], how, inclusive)
+    )
+
+
+def read_ndjson(file: Path) -> Iterator[tuple[int, ...]]:
+    """
+    Reads units from a file with one JSON object (with id, start and end) or array per line.
+    """
+    with file.open() as f:
+        for line in f:
+            if line.strip():
+                unit = json.loads(line)
+                yield (unit["id"], unit["start"], unit["end"]) if isinstance(unit, dict) else tuple(unit)
+
+
+def iter_columns(units: UnitArrays, chunk_size: int = 65536) -> Iterator[tuple[int, int, int]]:
+    """
+    Reads units from columns, e.g. the memory-mapped ones of a saved Document, one chunk at a time.
+    """
+    units = as_unit_arrays(units)
+    for start in range(0, len(units.ids), chunk_size):
+        yield from zip(*(column[start:start + chunk_size].tolist() for column in units))
+
+
+if __name__ == "__main__":
+    doc_a = (
+        [(0, 0, 10), (1, 11, 20)],
+        [(0, 0, 5, 0), (1, 6, 10, 0), (2, 11, 15, 1), (3, 16, 20, 1)]
+    )
+    doc_b = (
+        [(0, 0, 7), (1, 8, 20)],
+        [(0, 0, 5, 0), (1, 6, 7, 0), (2, 8, 15, 1), (3, 16, 20, 1)]
+    )
+    sentences, spans = map_documents(doc_a, doc_b)
+    assert (list(sentences), list(spans)) == ([(0, 0), (1, 0)], [(0, 0), (1, 1), (2, 1), (3, 3)])
+    assert list(map_units([], iter(doc_b[1]))) == [(0, -1), (1, -1), (2, -1), (3, -1)]
+    assert list(map_units(iter(doc_a[1]), [])) == []
+
+    try:
+        list(map_units(doc_a[1][::-1], doc_b[1]))
+        raise AssertionError("Unsorted units must be rejected")
+    except ValueError:
+        pass
+
+    try:
+        map_units(doc_a[1], doc_b[1], "contains")
+        raise AssertionError("Unknown mappings must be rejected")
+    except ValueError:
+        pass
+
+    # the same results as in memory, also for overlapping units
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        a, b = (sorted(
+            ((i, int(start), int(start + length)) for i, (start, length) in enumerate(rng.integers(0, [50, 10], (n, 2)))),
+            key=lambda unit: unit[1]
+        ) for n in rng.integers(0, 15, 2))
+        for how in ("first", "containment", "overlap"):
+            for inclusive in (True, False):
+                streamed = list(map_units(a, b, how, inclusive))
+                expected = map_units_in_memory(a, b, how, inclusive)
+                if how == "overlap":
+                    expected = [
+                        (b[i][0], int(a_id))
+                        for i in range(len(b)) for a_id in expected.ids[expected.indptr[i]:expected.indptr[i + 1]]
+                    ]
+                else:
+                    expected = [(unit[0], int(a_id)) for unit, a_id in zip(b, expected)]
+                assert streamed == expected, (how, inclusive, a, b)
+
+    # documents of millions of spans, memory-mapped and read lazily
+    with tempfile.TemporaryDirectory() as directory:
+        for name, seed in [("a", 1), ("b", 2)]:
+            random_document(200_000, 10, np.random.default_rng(seed)).save(Path(directory) / name)
+        document_a, document_b = (Document.load(Path(directory) / name) for name in ("a", "b"))
+
+        with (Path(directory) / "b.ndjson").open("w") as f:
+            for unit in iter_columns(document_b.spans):
+                f.write(json.dumps(dict(zip(("id", "start", "end"), unit))) + "\n")
+
+        start = time.perf_counter()
+        pairs = map_units(iter_columns(document_a.spans), read_ndjson(Path(directory) / "b.ndjson"), "overlap")
+        n_pairs = sum(1 for _ in pairs)
+        print(
+            f"Streamed {len(document_b.spans.ids):,} spans from NDJSON onto {len(document_a.spans.ids):,} memory-mapped ones "
+            f"in {time.perf_counter() - start:.1f}s, {n_pairs:,} overlaps"
+        )
+
+        tracemalloc.start()
+        for _ in map_units(iter_columns(document_a.spans), read_ndjson(Path(directory) / "b.ndjson"), "overlap"):
+            pass
+        print(f"Streaming took at most {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f}MB")
+        tracemalloc.stop()
+
+        streamed = np.fromiter(chain.from_iterable(map_units(
+            iter_columns(document_a.spans), iter_columns(document_b.spans), "containment"
+        )), dtype=np.int64).reshape(-1, 2)
+        assert (streamed[:, 1] == map_units_in_memory(document_a.spans, document_b.spans, "containment")).all()
@@ -0,0 +1,196 @@
+import sqlite3
+from typing import Optional
+
+import numpy as np
+
+
+def neighbours(indptr: np.ndarray, frontier: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the positions of all edges leaving the frontier nodes in a compressed sparse adjacency,
+    and the frontier node each of them leaves from.
+    """
+    starts = indptr[frontier]
+    lengths = indptr[frontier + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # each frontier node contributes the range starts..starts + lengths, built without a Python loop
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total), np.repeat(frontier, lengths)
+
+
+class CSRGraph:
+    """
+    The edge table kept in memory as integer node ids, in compressed sparse row (outgoing edges)
+    and compressed sparse column (incoming edges) form, for frontier at a time breadth-first traversals.
+    """
+
+    def __init__(
+            self,
+            names: list[str],
+            labels: list[Optional[str]],
+            sources: np.ndarray,
+            targets: np.ndarray,
+            edge_labels: np.ndarray
+    ):
+        self.names = names
+        self.node_ids = {name: node_id for node_id, name in enumerate(names)}
+        self.labels = labels
+
+        n_nodes = len(names)
+
+        # outgoing edges grouped by source
+        order = np.argsort(sources, kind="stable")
+        self.out_indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n_nodes))])
+        self.out_nodes = targets[order]
+        self.out_labels = edge_labels[order]
+
+        # incoming edges grouped by target
+        order = np.argsort(targets, kind="stable")
+        self.in_indptr = np.concatenate([[0], np.cumsum(np.bincount(targets, minlength=n_nodes))])
+        self.in_nodes = sources[order]
+        self.in_labels = edge_labels[order]
+
+    @classmethod
+    def from_database(cls, con: sqlite3.Connection) -> "CSRGraph":
+        """
+        Reads the node, label and edge tables once, mapping the database ids to consecutive integer ids.
+        """
+        rows = con.execute("SELECT id, name FROM node ORDER BY id").fetchall()
+        ids = np.array([node_id for node_id, _ in rows], dtype=np.int64)
+        names = [name for _, name in rows]
+        node_index = np.zeros(ids.max(initial=0) + 1, dtype=np.int64)
+        node_index[ids] = np.arange(len(ids))
+
+        # label id 0 stands for edges without a label
+        rows = con.execute("SELECT id, name FROM label ORDER BY id").fetchall()
+        label_ids = np.array([label_id for label_id, _ in rows], dtype=np.int64)
+        labels = [None, *(name for _, name in rows)]
+        label_index = np.zeros(label_ids.max(initial=0) + 1, dtype=np.int64)
+        label_index[label_ids] = np.arange(1, len(label_ids) + 1)
+
+        edges = np.fromiter(
+            con.execute("SELECT source, target, label FROM edge"),
+            dtype=[("source", np.int64), ("target", np.int64), ("label", np.int64)]
+        )
+
+        return cls(
+            names,
+            labels,
+            node_index[edges["source"]],
+            node_index[edges["target"]],
+            label_index[edges["label"]]
+        )
+
+    def matching_labels(self, pattern: str) -> np.ndarray:
+        """
+        Returns a mask over label ids which match the pattern, with the semantics of SQLite's LIKE.
+        """
+        con = sqlite3.connect(":memory:")
+        matches = [
+            label is not None and bool(con.execute("SELECT ? LIKE ?", (label, pattern)).fetchone()[0])
+            for label in self.labels
+        ]
+        con.close()
+        return np.array(matches, dtype=bool)
+
+    def traverse(
+            self,
+            node_id: int,
+            label: Optional[str] = None,
+            direction: str = "both",
+            max_hops: Optional[int] = None,
+            limit: Optional[int] = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Breadth-first traversal one frontier at a time, which stops after max_hops frontiers or once limit nodes are found.
+        As in sql_shortest_paths, every frontier is ordered by node id and one cut by the limit keeps its smallest ids.
+
+        :return: The reached node ids by depth and node id, their depths and the smallest node id each was reached from.
+        """
+        label_mask = self.matching_labels(label) if label is not None else None
+        adjacencies = []
+        if direction in ("out", "both"):
+            adjacencies.append((self.out_indptr, self.out_nodes, self.out_labels))
+        if direction in ("in", "both"):
+            adjacencies.append((self.in_indptr, self.in_nodes, self.in_labels))
+
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([node_id], dtype=np.int64)
+        visited[frontier] = True
+        order, depths, parents = [frontier], [np.zeros(1, dtype=np.int64)], [np.full(1, -1, dtype=np.int64)]
+        depth, found = 0, 1
+
+        while len(frontier) and (max_hops is None or depth < max_hops) and (limit is None or found < limit):
+            depth += 1
+            candidates, owners = [], []
+            for indptr, nodes, edge_labels in adjacencies:
+                edges, edge_owners = neighbours(indptr, frontier)
+                if label_mask is not None:
+                    matching = label_mask[edge_labels[edges]]
+                    edges, edge_owners = edges[matching], edge_owners[matching]
+                candidates.append(nodes[edges])
+                owners.append(edge_owners)
+
+            candidates, owners = np.concatenate(candidates), np.concatenate(owners)
+            new = ~visited[candidates]
+            # ordered by node id, then parent id, so every new node comes first with its smallest parent
+            by_node = np.lexsort((owners[new], candidates[new]))
+            frontier, first = np.unique(candidates[new][by_node], return_index=True)
+            frontier_parents = owners[new][by_node][first]
+            if limit is not None:
+                frontier, frontier_parents = frontier[:limit - found], frontier_parents[:limit - found]
+
+            visited[frontier] = True
+            found += len(frontier)
+            order.append(frontier)
+            depths.append(np.full(len(frontier), depth, dtype=np.int64))
+            parents.append(frontier_parents)
+
+        return np.concatenate(order), np.concatenate(depths), np.concatenate(parents)
+
+    def reachable(
+            self,
+            node: str,
+            label: Optional[str] = None,
+            direction: str = "both",
+            max_hops: Optional[int] = None,
+            limit: Optional[int] = None
+    ) -> list[str]:
+        """
+        Returns all nodes reachable from the given node, like the recursive query.
+        The start node is always part of the result, even if it is not in the graph.
+
+        :param node: The start node.
+        :param label: Optional label pattern, only edges matching it are followed.
+        :param direction: Follow edges along their direction (out), against it (in) or both.
+        :param max_hops: Optional maximum number of edges between the start node and a result.
+        :param limit: Optional maximum number of nodes to return.
+        :return: The reachable nodes in breadth-first order.
+        """
+        if node not in self.node_ids:
+            return [node]
+
+        node_ids, _, _ = self.traverse(self.node_ids[node], label, direction, max_hops, limit)
+        return [self.names[node_id] for node_id in node_ids]
+
+    def shortest_paths(
+            self,
+            node: str,
+            label: Optional[str] = None,
+            direction: str = "both",
+            max_hops: Optional[int] = None,
+            limit: Optional[int] = None
+    ) -> dict[str, tuple[int, Optional[str]]]:
+        """
+        Like reachable, but returns the depth of every reached node and its predecessor on a shortest path.
+        """
+        if node not in self.node_ids:
+            return {node: (0, None)}
+
+        node_ids, depths, parents = self.traverse(self.node_ids[node], label, direction, max_hops, limit)
+        return {
+            self.names[node_id]: (depth, self.names[parent] if parent >= 0 else None)
+            for node_id, depth, parent in zip(node_ids.tolist(), depths.tolist(), parents.tolist())
+        }
@@ -1,104 +1,654 @@
+import json
+import random
 import sqlite3
+import sys
+import time
+from enum import Enum
+from functools import lru_cache
+from itertools import chain, islice, zip_longest
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, NamedTuple, Optional
 
 import typer
 
+from csr_graph import CSRGraph
+from reachability_index import build_index, index_is_reachable, index_is_valid, index_reachable
+from server import ConnectionPool, make_server
+
 app = typer.Typer()
 default_database_path = Path.cwd() / "out.db"
 
 
+class Engine(str, Enum):
+    sql = "sql"
+    csr = "csr"
+    index = "index"
+
+
+class Direction(str, Enum):
+    outgoing = "out"
+    incoming = "in"
+    both = "both"
+
+
+class Traversal(NamedTuple):
+    label: Optional[str] = None
+    direction: Direction = Direction.both
+    max_hops: Optional[int] = None
+    limit: Optional[int] = None
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_hops is not None or self.limit is not None
+
+
+class Reached(NamedTuple):
+    node: str
+    depth: int
+    path: list[str]
+
+
+# (column the traversal comes from, column it goes to) per direction
+EDGE_STEPS = {
+    Direction.outgoing: [("source", "target")],
+    Direction.incoming: [("target", "source")],
+    Direction.both: [("source", "target"), ("target", "source")],
+}
+
+
+def read_edges(adjacency_list_file: Path) -> Iterator[tuple[str, str]]:
+    """
+    Streams the (source, target) edges of an adjacency list file, one line at a time.
+    """
+    with adjacency_list_file.open() as fp:
+        for line in fp:
+            edges = line.split(" ")
+            source = edges[0].strip()
+
+            for target in edges[1:]:
+                yield source, target.strip()
+
+
+def read_labels(labels_file: Path) -> Iterator[str]:
+    with labels_file.open() as fp:
+        for line in fp:
+            yield line.strip()
+
+
+def labelled_edges(edges: Iterator[tuple[str, str]], labels: Iterator[str]) -> Iterator[tuple[str, str, str]]:
+    """
+    Pairs the edges with their labels in lockstep, raising once one of both runs out before the other.
+    """
+    for counted, (edge, label) in enumerate(zip_longest(edges, labels)):
+        if edge is None or label is None:
+            # count what is left of both, to report the same numbers as reading them up front
+            n_edges = counted + (edge is not None) + sum(1 for _ in edges)
+            n_labels = counted + (label is not None) + sum(1 for _ in labels)
+            raise ValueError(f"Trying to map {n_labels} onto {n_edges} edges!")
+
+        yield *edge, label
+
+
 @app.command()
 def initialize(
         adjacency_list_file: Path,
         output_database_file: Path = default_database_path,
-        labels_file: Optional[Path] = None
+        labels_file: Optional[Path] = None,
+        chunk_size: int = 100_000
 ):
     """
     Reads an adjacency list file and creates a graph database from it.
     If a labels file is supplied, it is read and the labels for the edges are created in insertion order.
 
+    Both files are streamed and inserted in chunks of one transaction each, so memory stays bounded for any graph size.
+    The edges are then normalised to integer node and label ids, see normalise.
+    The database is built next to the output file and only moved in place once it is complete.
+
     :param adjacency_list_file: The adjacency list to read.
     :param output_database_file: The output database file.
     :param labels_file: An optional edge label file.
+    :param chunk_size: The number of edges inserted per transaction.
     """
 
-    sources, targets = [], []
+    if output_database_file.exists():
+        raise FileExistsError(f"{output_database_file} already exists!")
 
-    with adjacency_list_file.open() as fp:
-        for line in fp:
-            edges = line.split(" ")
-            source = edges[0].strip()
+    temporary_database_file = output_database_file.with_name(f".{output_database_file.name}.tmp")
+    temporary_database_file.unlink(missing_ok=True)
 
-            for target in edges[1:]:
-                sources.append(source)
-                targets.append(target.strip())
+    con = sqlite3.connect(temporary_database_file)
 
+    # nothing is lost on a crash during the load that a rerun doesn't recover, so don't wait for every write to hit the disk
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("CREATE TABLE raw_edge(source TEXT NOT NULL, target TEXT NOT NULL, label TEXT)")
+
+    query = "INSERT INTO raw_edge(source, target, label) VALUES (?, ?, ?)" if labels_file is not None else "INSERT INTO raw_edge(source, target) VALUES (?, ?)"
+    edges = read_edges(adjacency_list_file)
     if labels_file is not None:
-        with labels_file.open() as fp:
-            labels = [line.strip() for line in fp.readlines()]
+        edges = labelled_edges(edges, read_labels(labels_file))
+
+    inserted = 0
+    start = time.perf_counter()
+    try:
+        while chunk := list(islice(edges, chunk_size)):
+            with con:
+                con.executemany(query, chunk)
+
+            inserted += len(chunk)
+            elapsed = time.perf_counter() - start
+            typer.echo(f"\rInserted {inserted} edges ({inserted / elapsed:.0f} edges/s)", err=True, nl=False)
+        typer.echo(err=True)
+
+        typer.echo("Normalising", err=True)
+        normalise(con)
+        con.execute("VACUUM")
+
+        # back to a single file database
+        con.execute("PRAGMA journal_mode=DELETE")
+        con.close()
+    except BaseException:
+        con.close()
+        temporary_database_file.unlink(missing_ok=True)
+        raise
+
+    temporary_database_file.replace(output_database_file)
+    typer.echo(f"Created {output_database_file} with {inserted} edges in {time.perf_counter() - start:.1f}s", err=True)
+
+
+def normalise(con: sqlite3.Connection, from_text_edge_table: bool = False):
+    """
+    Moves the text edges of raw_edge into the normalised schema and drops raw_edge.
+    Node and label names are stored once in dictionary tables, the edge table only holds their integer ids
+    (label 0 for edges without one) and is clustered by (source, target, label), with a second covering index
+    for traversals against the edge direction. Duplicate edges are stored once.
+    All of it happens in one transaction, which is rolled back on failure.
+
+    :param from_text_edge_table: Whether the text edges are still in the edge table of an earlier schema,
+        which then becomes raw_edge first.
+    """
+    rename = """
+        DROP INDEX IF EXISTS edge_source;
+        DROP INDEX IF EXISTS edge_target;
+        ALTER TABLE edge RENAME TO raw_edge;
+    """ if from_text_edge_table else ""
 
-            if len(labels) != len(sources):
-                raise ValueError(f"Trying to map {len(labels)} onto {len(sources)} edges!")
+    # edges are inserted in key order and the second index is built afterwards, much faster than updating it per insert
+    try:
+        con.executescript(f"""
+            BEGIN;
+            {rename}
+            CREATE TABLE node(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+            CREATE TABLE label(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+            CREATE TABLE edge(
+                source INTEGER NOT NULL REFERENCES node(id),
+                target INTEGER NOT NULL REFERENCES node(id),
+                label INTEGER NOT NULL,
+                PRIMARY KEY (source, target, label)
+            ) WITHOUT ROWID;
+
+            INSERT INTO node(name) SELECT source FROM raw_edge UNION SELECT target FROM raw_edge;
+            INSERT INTO label(name) SELECT DISTINCT label FROM raw_edge WHERE label IS NOT NULL;
+
+            INSERT OR IGNORE INTO edge(source, target, label)
+            SELECT s.id, t.id, coalesce(l.id, 0)
+            FROM raw_edge
+            JOIN node s ON s.name = raw_edge.source
+            JOIN node t ON t.name = raw_edge.target
+            LEFT JOIN label l ON l.name = raw_edge.label
+            ORDER BY 1, 2, 3;
+
+            CREATE INDEX edge_target ON edge(target, source, label);
+            DROP TABLE raw_edge;
+            COMMIT;
+        """)
+    except sqlite3.Error:
+        if con.in_transaction:
+            con.rollback()
+        raise
+
+
+@app.command()
+def migrate(output_database_file: Path = default_database_path):
+    """
+    Converts a graph database with text edges, as created by earlier versions of initialize, to the normalised schema.
+
+    :param output_database_file: The graph database to migrate in place.
+    """
 
     con = sqlite3.connect(output_database_file)
-    cur = con.cursor()
 
-    cur.executescript("""
-        CREATE TABLE edge(source TEXT NOT NULL, target TEXT NOT NULL, label TEXT);
-        CREATE INDEX edge_source ON edge(source);
-        CREATE INDEX edge_target ON edge(target);
-    """)
+    if con.execute("SELECT 1 FROM sqlite_schema WHERE type = 'table' AND name = 'node'").fetchone() is not None:
+        typer.echo(f"{output_database_file} is already normalised", err=True)
+        return
+
+    normalise(con, from_text_edge_table=True)
+
+    # give the space of the text edges and their indexes back
+    con.execute("VACUUM")
+    con.close()
+
+
+def sql_reachable(
+        con: sqlite3.Connection,
+        node: str,
+        label: Optional[str] = None,
+        direction: Direction = Direction.both
+) -> list[str]:
+    """
+    Returns all nodes reachable from the given node with a recursive query.
+    The traversal runs on integer node ids, names are only looked up for the start node and the result.
+    """
+    start = con.execute("SELECT id FROM node WHERE name = ?", (node,)).fetchone()
+    if start is None:
+        return [node]
+
+    labels = "labels(id) AS (SELECT id FROM label WHERE name LIKE :label)," if label is not None else ""
+    label_filter = " WHERE label IN labels" if label is not None else ""
+    steps = "\n            UNION\n            ".join(
+        f"SELECT {to} FROM edge JOIN nodes ON {origin}=x{label_filter}" for origin, to in EDGE_STEPS[direction]
+    )
+
+    res = con.execute(f"""
+        WITH RECURSIVE {labels}
+        nodes(x) AS (
+            SELECT :start
+            UNION
+            {steps}
+        )
+        SELECT name FROM nodes JOIN node ON id=x;
+        """, {"start": start[0], "label": label})
+
+    return [x for x, in res]
+
+
+def sql_shortest_paths(con: sqlite3.Connection, node: str, traversal: Traversal) -> dict[str, tuple[int, Optional[str]]]:
+    """
+    Breadth-first traversal with one query per frontier, which stops after max_hops frontiers or once limit nodes
+    are found, so a bounded query only reads the edges of the neighbourhood it returns.
+
+    :return: Every reached node with its depth and its predecessor on a shortest path, by depth and node id.
+    """
+    start = con.execute("SELECT id FROM node WHERE name = ?", (node,)).fetchone()
+    if start is None:
+        return {node: (0, None)}
+
+    label_filter = " AND label IN (SELECT id FROM label WHERE name LIKE :label)" if traversal.label is not None else ""
+    queries = [
+        f"SELECT {origin}, {to} FROM edge WHERE {origin} IN (SELECT value FROM json_each(:frontier)){label_filter}"
+        for origin, to in EDGE_STEPS[traversal.direction]
+    ]
+
+    # node id -> (depth, predecessor id)
+    reached: dict[int, tuple[int, Optional[int]]] = {start[0]: (0, None)}
+    frontier, depth = [start[0]], 0
+
+    while (
+            frontier
+            and (traversal.max_hops is None or depth < traversal.max_hops)
+            and (traversal.limit is None or len(reached) < traversal.limit)
+    ):
+        depth += 1
+        parameters = {"frontier": json.dumps(frontier), "label": traversal.label}
+
+        # new node id -> its smallest parent id, independent of the order SQLite returns the edges in
+        found: dict[int, int] = {}
+        for parent, child in chain.from_iterable(con.execute(query, parameters) for query in queries):
+            if child not in reached and parent < found.get(child, sys.maxsize):
+                found[child] = parent
 
-    con.commit()
+        # as in CSRGraph.traverse, a frontier cut by the limit keeps its smallest node ids
+        frontier = sorted(found)
+        if traversal.limit is not None:
+            frontier = frontier[:traversal.limit - len(reached)]
+        for child in frontier:
+            reached[child] = (depth, found[child])
 
-    query = "INSERT INTO edge(source, target, label) VALUES (?, ?, ?)" if labels_file is not None else "INSERT INTO edge(source, target) VALUES (?, ?)"
-    edges = zip(sources, targets, labels) if labels_file is not None else zip(sources, targets)
+    return names_of(con, reached)
+
+
+def names_of(
+        con: sqlite3.Connection,
+        reached: dict[int, tuple[int, Optional[int]]]
+) -> dict[str, tuple[int, Optional[str]]]:
+    names = dict(con.execute(
+        "SELECT id, name FROM node WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(reached)),)
+    ))
+    return {names[node_id]: (depth, names.get(parent)) for node_id, (depth, parent) in reached.items()}
+
+
+def paths(reached: dict[str, tuple[int, Optional[str]]]) -> list[Reached]:
+    """
+    Follows the predecessors back to the start node, for every reached node.
+    """
+    result = []
+    for node, (depth, parent) in reached.items():
+        path = [node]
+        while parent is not None:
+            path.append(parent)
+            parent = reached[parent][1]
+        result.append(Reached(node, depth, path[::-1]))
+
+    return result
+
+
+def reachable_nodes(
+        con: sqlite3.Connection,
+        node: str,
+        traversal: Traversal = Traversal(),
+        engine: Engine = Engine.sql,
+        graph: Optional[CSRGraph] = None
+) -> list[str]:
+    """
+    Returns all nodes reachable from the given node with the chosen engine.
+    The csr engine uses the given in-memory graph, or loads it from the connection.
+    """
+    if engine == Engine.index and (traversal.label is not None or traversal.bounded or not index_is_valid(con)):
+        # the index is built over all edges without depths, so these queries fall back to the traversal
+        engine = Engine.sql
+
+    if engine == Engine.index:
+        return index_reachable(con, node, traversal.direction.value)
+    if engine == Engine.csr:
+        return (graph or CSRGraph.from_database(con)).reachable(node, *traversal)
+    if traversal.bounded:
+        return list(sql_shortest_paths(con, node, traversal))
+    return sql_reachable(con, node, traversal.label, traversal.direction)
+
+
+def shortest_paths(
+        con: sqlite3.Connection,
+        node: str,
+        traversal: Traversal = Traversal(),
+        engine: Engine = Engine.sql,
+        graph: Optional[CSRGraph] = None
+) -> list[Reached]:
+    """
+    Returns all nodes reachable from the given node with their depth and a shortest path from the start node.
+    The index has no paths, so it is traversed with SQL instead.
+    """
+    if engine == Engine.csr:
+        reached = (graph or CSRGraph.from_database(con)).shortest_paths(node, *traversal)
+    else:
+        reached = sql_shortest_paths(con, node, traversal)
 
-    cur.executemany(query, edges)
-    con.commit()
+    return paths(reached)
 
 
 @app.command()
-def query(node: str, output_database_file: Path = default_database_path, label: Optional[str] = None):
+def query(
+        node: str,
+        output_database_file: Path = default_database_path,
+        label: Optional[str] = None,
+        engine: Engine = Engine.sql,
+        direction: Direction = Direction.both,
+        max_hops: Optional[int] = None,
+        limit: Optional[int] = None,
+        with_paths: bool = False
+):
     """
     Reads a graph database and returns all nodes reachable from the given node.
 
     :param node: The start node.
     :param output_database_file: The graph database to read.
     :param label: Optional label to filter for.
+    :param engine: Traverse with a recursive SQL query, load the edges into memory and traverse there,
+        or look the nodes up in the reachability index (see the index command).
+    :param direction: Follow edges along their direction (out), against it (in) or both.
+    :param max_hops: Optional maximum number of edges between the start node and a result.
+    :param limit: Optional maximum number of nodes to return, the closest first.
+    :param with_paths: Also return the depth and a shortest path for every node.
     :return: A list of nodes reachable from the start node.
     """
 
     con = sqlite3.connect(output_database_file)
-    cur = con.cursor()
+    traversal = Traversal(label.strip() if label is not None else None, direction, max_hops, limit)
 
-    if label is not None:
-        res = cur.execute("""
-        WITH RECURSIVE nodes(x) AS (
-            SELECT ?
-            UNION
-            SELECT source FROM edge JOIN nodes ON target=x WHERE label LIKE ?
-            UNION
-            SELECT target FROM edge JOIN nodes ON source=x WHERE label LIKE ?
-        )
-        SELECT x FROM nodes;                          
-        """, (node.strip(), label.strip(), label.strip(),))
+    if engine == Engine.index and (label is not None or traversal.bounded or with_paths or not index_is_valid(con)):
+        typer.echo("Reachability index not usable for this query, traversing instead", err=True)
+
+    print(f"Nodes that can be reached from {node.strip()}")
+    if with_paths:
+        print([tuple(reached) for reached in shortest_paths(con, node.strip(), traversal, engine)])
     else:
-        res = cur.execute("""
-        WITH RECURSIVE nodes(x) AS (
-            SELECT ?
-            UNION
-            SELECT source FROM edge JOIN nodes ON target=x
-            UNION
-            SELECT target FROM edge JOIN nodes ON source=x
+        print([(target,) for target in reachable_nodes(con, node.strip(), traversal, engine)])
+
+
+def resolve(
+        con: sqlite3.Connection,
+        node: str,
+        traversal: Traversal,
+        with_paths: bool,
+        engine: Engine,
+        graph: Optional[CSRGraph] = None
+) -> list:
+    """
+    Returns the reachable nodes, or with paths a {"node", "depth", "path"} dictionary per node, for JSON output.
+    """
+    if with_paths:
+        return [reached._asdict() for reached in shortest_paths(con, node, traversal, engine, graph)]
+    return reachable_nodes(con, node, traversal, engine, graph)
+
+
+@app.command()
+def batch(
+        nodes_file: Optional[Path] = typer.Argument(None, help="File with one start node per line, defaults to stdin"),
+        output_database_file: Path = default_database_path,
+        label: Optional[str] = None,
+        engine: Engine = Engine.sql,
+        direction: Direction = Direction.both,
+        max_hops: Optional[int] = None,
+        limit: Optional[int] = None,
+        with_paths: bool = False
+):
+    """
+    Reads many start nodes and writes the nodes reachable from each as one JSON object per line,
+    reusing a single connection (and for the csr engine a single in-memory graph) for all of them.
+
+    :param nodes_file: File with one start node per line, defaults to stdin.
+    :param output_database_file: The graph database to read.
+    :param label: Optional label to filter for.
+    :param engine: See query.
+    :param direction: See query.
+    :param max_hops: See query.
+    :param limit: See query.
+    :param with_paths: See query.
+    """
+
+    con = sqlite3.connect(output_database_file)
+    traversal = Traversal(label.strip() if label is not None else None, direction, max_hops, limit)
+    graph = CSRGraph.from_database(con) if engine == Engine.csr else None
+
+    with (nodes_file.open() if nodes_file is not None else sys.stdin) as fp:
+        for line in fp:
+            node = line.strip()
+            if not node:
+                continue
+
+            reachable = resolve(con, node, traversal, with_paths, engine, graph)
+            sys.stdout.write(json.dumps({"node": node, "reachable": reachable}) + "\n")
+
+
+@app.command()
+def serve(
+        output_database_file: Path = default_database_path,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        unix_socket: Optional[Path] = None,
+        engine: Engine = Engine.sql,
+        connections: int = 4,
+        cache_size: int = 1024
+):
+    """
+    Serves reachability queries over HTTP as GET /query?node=<node>, on localhost or a Unix socket.
+    The options of query are passed as further parameters, e.g. &label=Friends&direction=out&max_hops=2&with_paths=true.
+    The database is opened read-only by a pool of connections and results are kept in an LRU cache,
+    so a query costs only its traversal.
+
+    :param output_database_file: The graph database to serve.
+    :param host: The host to listen on.
+    :param port: The port to listen on.
+    :param unix_socket: Listen on this Unix socket instead of host and port.
+    :param engine: See query.
+    :param connections: The number of pooled read-only connections, which bounds the concurrent queries.
+    :param cache_size: The number of query results to cache.
+    """
+
+    if unix_socket is not None and unix_socket.exists() and not unix_socket.is_socket():
+        typer.echo(f"{unix_socket} exists and is not a socket, refusing to replace it", err=True)
+        raise typer.Exit(code=1)
+
+    pool = ConnectionPool(output_database_file, connections)
+    with pool.connection() as con:
+        graph = CSRGraph.from_database(con) if engine == Engine.csr else None
+
+    @lru_cache(maxsize=cache_size)
+    def cached_resolve(node: str, traversal: Traversal, with_paths: bool) -> list:
+        with pool.connection() as con:
+            return resolve(con, node, traversal, with_paths, engine, graph)
+
+    def resolve_parameters(node: str, parameters: dict[str, str]) -> list:
+        traversal = Traversal(
+            parameters["label"].strip() if "label" in parameters else None,
+            Direction(parameters.get("direction", Direction.both)),
+            int(parameters["max_hops"]) if "max_hops" in parameters else None,
+            int(parameters["limit"]) if "limit" in parameters else None
         )
-        SELECT x FROM nodes;
-        """, (node.strip(),))
-    targets = res.fetchall()
+        return cached_resolve(node, traversal, parameters.get("with_paths", "false") == "true")
 
-    print(f"Nodes that can be reached from {node.strip()}")
-    print(targets)
+    server = make_server(resolve_parameters, host, port, unix_socket)
+    typer.echo(f"Serving {output_database_file} on {unix_socket or f'http://{host}:{port}'}", err=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        if unix_socket is not None:
+            unix_socket.unlink(missing_ok=True)
+
+
+@app.command()
+def index(output_database_file: Path = default_database_path):
+    """
+    Builds the reachability index of a graph database, it stays valid until the edges change.
+
+    :param output_database_file: The graph database to index.
+    """
+
+    con = sqlite3.connect(output_database_file)
+    start = time.perf_counter()
+    build_index(con)
+    typer.echo(f"Built reachability index in {time.perf_counter() - start:.1f}s", err=True)
+
+
+@app.command()
+def reachable(
+        source: str,
+        target: str,
+        output_database_file: Path = default_database_path,
+        directed: bool = False
+):
+    """
+    Checks whether a node can be reached from another one, using the reachability index if it is up to date.
+
+    :param source: The start node.
+    :param target: The node to reach.
+    :param output_database_file: The graph database to read.
+    :param directed: Only follow edges in their direction.
+    """
+
+    con = sqlite3.connect(output_database_file)
+    source, target = source.strip(), target.strip()
+
+    if index_is_valid(con):
+        found = index_is_reachable(con, source, target, directed)
+    elif directed:
+        typer.echo("Reachability index not usable, build it with the index command", err=True)
+        raise typer.Exit(code=1)
+    else:
+        found = target in sql_reachable(con, source)
+
+    print(f"{target} {'can' if found else 'cannot'} be reached from {source}")
+
+
+@app.command()
+def generate(
+        adjacency_list_file: Path,
+        nodes: int = 1_000_000,
+        edges: int = 5_000_000,
+        labels_file: Optional[Path] = None,
+        labels: int = 10,
+        seed: int = 0
+):
+    """
+    Writes a random graph as adjacency list (and optionally a labels file), to benchmark larger graphs.
+
+    :param adjacency_list_file: The adjacency list to write.
+    :param nodes: The number of nodes.
+    :param edges: The number of edges, drawn uniformly at random.
+    :param labels_file: An optional edge label file to write.
+    :param labels: The number of distinct labels.
+    :param seed: Seed of the random generator.
+    """
+
+    rng = random.Random(seed)
+    adjacency: dict[int, list[int]] = {}
+    for _ in range(edges):
+        adjacency.setdefault(rng.randrange(nodes), []).append(rng.randrange(nodes))
+
+    with adjacency_list_file.open("w") as fp:
+        for source, targets in adjacency.items():
+            fp.write(" ".join(f"n{node}" for node in [source, *targets]) + "\n")
+
+    if labels_file is not None:
+        with labels_file.open("w") as fp:
+            for _ in range(edges):
+                fp.write(f"label{rng.randrange(labels)}\n")
+
+
+@app.command()
+def benchmark(
+        output_database_file: Path = default_database_path,
+        queries: int = 10,
+        label: Optional[str] = None,
+        seed: int = 0
+):
+    """
+    Times the recursive SQL query against the in-memory engine for random start nodes and checks they agree.
+
+    :param output_database_file: The graph database to read.
+    :param queries: The number of start nodes to query.
+    :param label: Optional label to filter for.
+    :param seed: Seed for picking the start nodes.
+    """
+
+    con = sqlite3.connect(output_database_file)
+
+    start = time.perf_counter()
+    graph = CSRGraph.from_database(con)
+    load_time = time.perf_counter() - start
+    print(f"Loaded {len(graph.out_nodes)} edges between {len(graph.names)} nodes in {load_time:.2f}s")
+
+    sql_time, csr_time = 0.0, 0.0
+    for node in random.Random(seed).choices(graph.names, k=queries):
+        start = time.perf_counter()
+        expected = sql_reachable(con, node, label)
+        sql_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = graph.reachable(node, label)
+        csr_time += time.perf_counter() - start
+
+        if set(result) != set(expected):
+            raise ValueError(f"Engines disagree for {node}: {len(result)} vs {len(expected)} nodes!")
+
+    print(f"sql: {sql_time / queries * 1000:.1f}ms per query")
+    print(f"csr: {csr_time / queries * 1000:.1f}ms per query (speed-up {sql_time / csr_time:.1f}x)")
+    print(f"csr including load: {(csr_time + load_time) / queries * 1000:.1f}ms per query")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import sqlite3
+import time
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+def interval_labels(
+        n_components: int,
+        dag_sources: np.ndarray,
+        dag_targets: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Labels every component of the condensed graph with an interval [low, post] from a depth-first post-order,
+    where low is the lowest post-order number of all its descendants.
+    If a component reaches another, its interval contains the other one, the reverse only holds for tree edges.
+    """
+    order = np.argsort(dag_sources, kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(dag_sources, minlength=n_components))])
+    children = dag_targets[order].tolist()
+    indptr = indptr.tolist()
+
+    post = np.full(n_components, -1, dtype=np.int64)
+    low = np.full(n_components, -1, dtype=np.int64)
+    counter = 0
+
+    roots = np.flatnonzero(np.bincount(dag_targets, minlength=n_components) == 0).tolist()
+    for root in roots:
+        stack = [(root, indptr[root])]
+        post[root] = -2
+        while stack:
+            component, position = stack[-1]
+            if position < indptr[component + 1]:
+                stack[-1] = (component, position + 1)
+                child = children[position]
+                if post[child] == -1:
+                    post[child] = -2
+                    stack.append((child, indptr[child]))
+                continue
+
+            stack.pop()
+            post[component] = counter
+            descendants = children[indptr[component]:indptr[component + 1]]
+            low[component] = min(counter, low[descendants].min(initial=counter))
+            counter += 1
+
+    return low, post
+
+
+def build_index(con: sqlite3.Connection):
+    """
+    Computes the strongly connected components of the graph, condenses them into a DAG and stores interval labels
+    per component, as well as the weakly connected component of every node.
+    Triggers on the edge table mark the index as outdated as soon as the edges change.
+    """
+    edges = np.fromiter(
+        con.execute("SELECT source, target FROM edge"),
+        dtype=[("source", np.int64), ("target", np.int64)]
+    )
+    n_nodes = int(con.execute("SELECT coalesce(max(id), 0) + 1 FROM node").fetchone()[0])
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(edges), dtype=np.int8), (edges["source"], edges["target"])),
+        shape=(n_nodes, n_nodes)
+    )
+
+    n_scc, scc = connected_components(adjacency, directed=True, connection="strong")
+    _, wcc = connected_components(adjacency, directed=True, connection="weak")
+
+    scc = scc.astype(np.int64)
+    dag = np.unique(scc[edges["source"]] * n_scc + scc[edges["target"]])
+    dag_sources, dag_targets = np.divmod(dag, n_scc)
+    between = dag_sources != dag_targets
+    dag_sources, dag_targets = dag_sources[between], dag_targets[between]
+
+    low, post = interval_labels(n_scc, dag_sources, dag_targets)
+
+    node_ids = np.fromiter(con.execute("SELECT id FROM node"), dtype=[("id", np.int64)])["id"]
+
+    con.executescript("""
+        BEGIN;
+        DROP TABLE IF EXISTS reachability_index;
+        DROP TABLE IF EXISTS component;
+        DROP TABLE IF EXISTS scc;
+        DROP TABLE IF EXISTS scc_edge;
+
+        CREATE TABLE component(node INTEGER PRIMARY KEY, scc INTEGER NOT NULL, wcc INTEGER NOT NULL);
+        CREATE TABLE scc(id INTEGER PRIMARY KEY, low INTEGER NOT NULL, post INTEGER NOT NULL);
+        CREATE TABLE scc_edge(source INTEGER NOT NULL, target INTEGER NOT NULL, PRIMARY KEY (source, target)) WITHOUT ROWID;
+        CREATE TABLE reachability_index(built REAL NOT NULL);
+
+        CREATE TRIGGER IF NOT EXISTS edge_insert_invalidates_index AFTER INSERT ON edge
+        BEGIN DELETE FROM reachability_index; END;
+        CREATE TRIGGER IF NOT EXISTS edge_update_invalidates_index AFTER UPDATE ON edge
+        BEGIN DELETE FROM reachability_index; END;
+        CREATE TRIGGER IF NOT EXISTS edge_delete_invalidates_index AFTER DELETE ON edge
+        BEGIN DELETE FROM reachability_index; END;
+    """)
+
+    con.executemany(
+        "INSERT INTO component(node, scc, wcc) VALUES (?, ?, ?)",
+        zip(node_ids.tolist(), scc[node_ids].tolist(), wcc[node_ids].tolist())
+    )
+    con.executemany("INSERT INTO scc(id, low, post) VALUES (?, ?, ?)", zip(range(n_scc), low.tolist(), post.tolist()))
+    con.executemany("INSERT INTO scc_edge(source, target) VALUES (?, ?)", zip(dag_sources.tolist(), dag_targets.tolist()))
+
+    con.execute("CREATE INDEX component_scc ON component(scc)")
+    con.execute("CREATE INDEX component_wcc ON component(wcc)")
+    con.execute("INSERT INTO reachability_index(built) VALUES (?)", (time.time(),))
+    con.commit()
+
+
+def index_is_valid(con: sqlite3.Connection) -> bool:
+    if con.execute("SELECT 1 FROM sqlite_schema WHERE type = 'table' AND name = 'reachability_index'").fetchone() is None:
+        return False
+    return con.execute("SELECT 1 FROM reachability_index").fetchone() is not None
+
+
+def index_reachable(con: sqlite3.Connection, node: str, direction: str = "both") -> list[str]:
+    """
+    Returns all nodes reachable from the given node. Following edges in both directions, that is its weak component,
+    otherwise the nodes of all strong components reachable in the condensed graph.
+    """
+    if direction == "both":
+        res = con.execute("""
+            SELECT name FROM component JOIN node ON id=node
+            WHERE wcc = (SELECT wcc FROM component JOIN node ON id=node WHERE name = ?);
+        """, (node,))
+    else:
+        if direction == "out":
+            step = "SELECT target FROM scc_edge JOIN sccs ON source=c"
+        else:
+            step = "SELECT source FROM scc_edge JOIN sccs ON target=c"
+        res = con.execute(f"""
+            WITH RECURSIVE sccs(c) AS (
+                SELECT scc FROM component JOIN node ON id=node WHERE name = ?
+                UNION
+                {step}
+            )
+            SELECT name FROM sccs JOIN component ON scc=c JOIN node ON id=node;
+        """, (node,))
+
+    return [x for x, in res] or [node]
+
+
+def component(con: sqlite3.Connection, node: str) -> Optional[tuple[int, int, int, int]]:
+    """
+    Returns the strong component, weak component and interval label of a node.
+    """
+    return con.execute("""
+        SELECT c.scc, c.wcc, s.low, s.post
+        FROM node JOIN component c ON c.node=node.id JOIN scc s ON s.id=c.scc
+        WHERE name = ?;
+    """, (node,)).fetchone()
+
+
+def index_is_reachable(con: sqlite3.Connection, source: str, target: str, directed: bool = False) -> bool:
+    """
+    Returns whether target can be reached from source, following edges in both directions or only along them.
+    Directed queries are answered by the interval labels where possible, otherwise by a search of the condensed graph
+    pruned to components whose interval still contains the target's.
+    """
+    if source == target:
+        return True
+
+    source_component, target_component = component(con, source), component(con, target)
+    if source_component is None or target_component is None:
+        return False
+
+    source_scc, source_wcc, source_low, source_post = source_component
+    target_scc, target_wcc, target_low, target_post = target_component
+    if not directed or source_wcc != target_wcc:
+        return source_wcc == target_wcc
+    if source_scc == target_scc:
+        return True
+    if not (source_low <= target_low and target_post <= source_post):
+        return False
+
+    found = con.execute("""
+        WITH RECURSIVE reach(c) AS (
+            SELECT :source
+            UNION
+            SELECT target FROM scc_edge JOIN reach ON source=c JOIN scc ON id=target
+            WHERE low <= :low AND :post <= post
+        )
+        SELECT 1 FROM reach WHERE c = :target;
+    """, {"source": source_scc, "low": target_low, "post": target_post, "target": target_scc})
+    return found.fetchone() is not None
@@ -0,0 +1,125 @@
+import json
+import socketserver
+import sqlite3
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import Queue
+from typing import Callable, Iterator, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# (node, further query parameters) -> reachable nodes, raises a ValueError for invalid parameters
+Resolver = Callable[[str, dict[str, str]], list]
+
+
+class ConnectionPool:
+    """
+    A fixed number of read-only connections to a graph database, shared between the request threads.
+    Every connection keeps its own cache of prepared statements, so repeated queries skip parsing and planning.
+    """
+
+    def __init__(self, database_file: Path, size: int = 4, cached_statements: int = 128):
+        self.connections: Queue[sqlite3.Connection] = Queue()
+        for _ in range(size):
+            self.connections.put(sqlite3.connect(
+                f"{database_file.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=cached_statements
+            ))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        con = self.connections.get()
+        try:
+            yield con
+        finally:
+            self.connections.put(con)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /query?node=<node>[&<parameter>=<value>...] with {"node": ..., "reachable": [...]}.
+    """
+
+    # keeps connections open between requests, every response has a content length
+    protocol_version = "HTTP/1.1"
+    resolve: Resolver
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/query":
+            self.send_error(404)
+            return
+
+        parameters = parse_qs(url.query)
+        if "node" not in parameters:
+            self.send_error(400, "Missing node parameter")
+            return
+
+        node = parameters.pop("node")[0].strip()
+        try:
+            reachable = self.resolve(node, {name: values[0] for name, values in parameters.items()})
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+        except Exception as error:
+            # answered, so that a keep-alive client isn't left waiting on a connection without a response
+            self.log_error("Query for %r failed: %r", node, error)
+            self.send_error(500, str(error))
+            return
+
+        body = json.dumps({"node": node, "reachable": reachable}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format: str, *args):
+        # one line per request would cost more than a cached query
+        pass
+
+    def log_error(self, format: str, *args):
+        # errors are still logged, they are rare
+        super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+        resolve: Resolver,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        unix_socket: Optional[Path] = None
+) -> socketserver.BaseServer:
+    """
+    Creates a threading HTTP server answering reachability queries with resolve,
+    either on a local TCP port or on a Unix socket.
+    """
+    # without Nagle's algorithm, the separately written headers and body don't wait for a delayed ACK (~40ms)
+    handler = type(
+        "BoundQueryHandler",
+        (QueryHandler,),
+        {"resolve": staticmethod(resolve), "disable_nagle_algorithm": unix_socket is None}
+    )
+
+    if unix_socket is not None:
+        # only a stale socket of an earlier run is replaced, never e.g. the database itself
+        if unix_socket.exists() and not unix_socket.is_socket():
+            raise FileExistsError(f"{unix_socket} exists and is not a socket")
+        unix_socket.unlink(missing_ok=True)
+        return ThreadingUnixHTTPServer(str(unix_socket), handler)
+
+    return ThreadingHTTPServer((host, port), handler)
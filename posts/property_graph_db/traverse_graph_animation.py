@@ -1,36 +1,171 @@
+import argparse
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
 import networkx as nx
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import numpy as np
+from matplotlib.animation import FuncAnimation, writers
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba
+from matplotlib.image import FigureImage
 
+DEFAULT_COLOR = to_rgba("green")
+START_COLOR = to_rgba("blue")
+END_COLOR = to_rgba("red")
 
-def main():
-    fig, ax = plt.subplots()
 
-    G = nx.read_adjlist("student_graph.adj", create_using=nx.DiGraph)
-    pos = nx.planar_layout(G)  # positions for all nodes
+def layout(G: nx.Graph, name: str = "planar") -> dict:
+    if name == "random":
+        return nx.random_layout(G, seed=0)
+
+    if name == "planar":
+        try:
+            return nx.planar_layout(G)  # positions for all nodes
+        except nx.NetworkXException:
+            # larger graphs are rarely planar
+            pass
+
+    return nx.spring_layout(G, seed=0)
+
+
+def decimate(edges: Iterable[tuple[str, str]], every: int) -> Iterator[tuple[str, str]]:
+    """
+    Keeps only every n-th traversed edge as a frame.
+    """
+    return islice(edges, 0, None, every)
+
+
+class TraversalAnimation:
+    """
+    Draws the graph once and afterwards only moves the two markers of the current edge's start and end node,
+    so a frame costs the same no matter how large the graph is.
+    """
+
+    def __init__(
+            self,
+            G: nx.Graph,
+            ax: plt.Axes,
+            pos: dict,
+            with_labels: bool,
+            with_arrows: bool,
+            node_size: float = 300
+    ):
+        self.pos = pos
 
-    nx.draw(G, ax=ax, pos=pos, node_color=['green' for _ in enumerate(G.nodes)], with_labels=True)
+        nodes = nx.draw_networkx_nodes(G, pos, ax=ax, node_color=[DEFAULT_COLOR], node_size=node_size)
+        # without arrows, all edges are a single LineCollection instead of one patch per edge
+        edges = nx.draw_networkx_edges(G, pos, ax=ax, arrows=with_arrows, node_size=node_size)
+        self.static = [nodes, *(edges if isinstance(edges, list) else [edges])]
+        self.labels = list(nx.draw_networkx_labels(G, pos, ax=ax).values()) if with_labels else []
+        ax.set_axis_off()
 
-    def update(edge: tuple[str, str]):
-            # for each frame color different edges
+        # on top of the nodes but below the labels, like nx.draw
+        self.current: PathCollection = ax.scatter([], [], s=node_size, zorder=2.5)
+        self.background: Optional[FigureImage] = None
+
+    def init(self) -> tuple[PathCollection]:
+        self.current.set_offsets(np.empty((0, 2)))
+        return self.current,
+
+    def update(self, edge: tuple[str, str]) -> tuple[PathCollection]:
+        # for each frame color different edges
+        start, end = edge
+        self.current.set_offsets([self.pos[start], self.pos[end]])
+        self.current.set_facecolor([START_COLOR, END_COLOR])
+        return self.current,
+
+    def freeze(self, fig: plt.Figure):
+        """
+        Renders the nodes and edges once into an image behind the axes and hides them,
+        so writing a frame (which always draws the whole figure) only draws that image and the current edge.
+        The figure must be saved at its own dpi.
+        """
+        for artist in [self.current, *self.labels]:
+            artist.set_visible(False)
+
+        fig.canvas.draw()
+        self.background = fig.figimage(np.asarray(fig.canvas.buffer_rgba()).copy(), origin="upper", zorder=-1)
+
+        for artist in self.static:
+            artist.set_visible(False)
+        for artist in [self.current, *self.labels]:
+            artist.set_visible(True)
+
+    def thaw(self):
+        self.background.remove()
+        self.background = None
+        for artist in self.static:
+            artist.set_visible(True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("adjacency_list_file", nargs="?", default=Path("student_graph.adj"), type=Path)
+    parser.add_argument("--source", default="Alice", help="Start node of the depth-first traversal")
+    parser.add_argument("--output", default=Path("student_graph_traversal.gif"), type=Path)
+    parser.add_argument(
+        "--writer",
+        default="pillow",
+        choices=["pillow", "ffmpeg", "imagemagick"],
+        help="pillow keeps every frame in memory until the end, ffmpeg and imagemagick stream frames to a subprocess"
+    )
+    parser.add_argument("--every", default=1, type=int, help="Only render every n-th traversed edge")
+    parser.add_argument("--interval", default=500, type=int, help="Milliseconds between frames")
+    parser.add_argument("--dpi", default=100, type=int)
+    parser.add_argument(
+        "--layout",
+        default="planar",
+        choices=["planar", "spring", "random"],
+        help="planar falls back to spring for non-planar graphs, random is the fastest for large graphs"
+    )
+    parser.add_argument(
+        "--labels",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Draw node labels, by default only for graphs of at most 100 nodes"
+    )
+    parser.add_argument(
+        "--arrows",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Draw edge arrows, by default only for graphs of at most 100 nodes"
+    )
+    parser.add_argument("--node-size", default=None, type=float, help="Defaults to 300 for graphs of at most 100 nodes, else 10")
+    parser.add_argument("--show", action=argparse.BooleanOptionalAction, default=True)
+    args = parser.parse_args()
 
-            start, end = edge
+    G = nx.read_adjlist(args.adjacency_list_file, create_using=nx.DiGraph)
+    pos = layout(G, args.layout)
+    with_labels = args.labels if args.labels is not None else len(G) <= 100
+    with_arrows = args.arrows if args.arrows is not None else len(G) <= 100
+    node_size = args.node_size if args.node_size is not None else (300 if len(G) <= 100 else 10)
 
-            node_color = []
-            for node in G.nodes:
-                if node == start:
-                    node_color.append('blue')
-                elif node == end:
-                    node_color.append('red')
-                else:
-                    node_color.append('green')
+    fig, ax = plt.subplots(dpi=args.dpi)
+    animation = TraversalAnimation(G, ax, pos, with_labels, with_arrows, node_size)
 
-            nx.draw(G, ax=ax, pos=pos, node_color=node_color, with_labels=True)
-            return ax
+    # frames are grabbed one at a time as the traversal goes, none are cached
+    writer = writers[args.writer](fps=1000 / args.interval)
+    animation.freeze(fig)
+    with writer.saving(fig, str(args.output), dpi=args.dpi):
+        animation.init()
+        for edge in decimate(nx.dfs_edges(G, source=args.source), args.every):
+            animation.update(edge)
+            writer.grab_frame()
+    animation.thaw()
 
-    ani = FuncAnimation(fig=fig, func=update, frames=nx.dfs_edges(G, source="Alice"), interval=500)
-    ani.save(filename="student_graph_traversal.gif", writer="pillow")
-    plt.show()
+    if args.show:
+        ani = FuncAnimation(
+            fig=fig,
+            func=animation.update,
+            frames=decimate(nx.dfs_edges(G, source=args.source), args.every),
+            init_func=animation.init,
+            interval=args.interval,
+            blit=True,
+            cache_frame_data=False
+        )
+        plt.show()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import json
+import math
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+# at most all 98 cards can be played
+MAX_CARDS_PLAYED = 98
+
+
+class RunningStats:
+    """
+    Keeps a histogram and the running mean/variance of cards played, merging batches with Welford's (Chan's) update.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram = np.zeros(MAX_CARDS_PLAYED + 1, dtype=np.int64)
+
+    def update(self, histogram: np.ndarray):
+        """
+        Merges a batch of games given as a histogram of cards played.
+        """
+        n_batch = int(histogram.sum())
+        if not n_batch:
+            return
+
+        values = np.arange(len(histogram))
+        mean_batch = float((values * histogram).sum() / n_batch)
+        m2_batch = float((histogram * (values - mean_batch) ** 2).sum())
+
+        n = self.n + n_batch
+        delta = mean_batch - self.mean
+        self.mean += delta * n_batch / n
+        self.m2 += m2_batch + delta ** 2 * self.n * n_batch / n
+        self.n = n
+        self.histogram += histogram
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    def confidence_interval(self, confidence: float = 0.95) -> tuple[float, float]:
+        """
+        Returns the normal approximation confidence interval of the mean.
+        """
+        if self.n < 2:
+            return -math.inf, math.inf
+
+        half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(self.variance / self.n)
+        return self.mean - half_width, self.mean + half_width
+
+    def converged(self, ci_width: float, confidence: float = 0.95) -> bool:
+        low, high = self.confidence_interval(confidence)
+        return high - low <= ci_width
+
+
+def write_summary(
+        path: Path,
+        stats: dict[tuple[int, str], RunningStats],
+        confidence: float = 0.95,
+        finished: bool = False
+):
+    """
+    Writes one compact JSON summary of all (n_players, strategy) cells, replacing the file atomically.
+    """
+    summary = {
+        "confidence": confidence,
+        "finished": finished,
+        "cells": [
+            {
+                "num_players": n_players,
+                "strategy": strategy,
+                "games": cell.n,
+                "mean": cell.mean,
+                "variance": cell.variance if cell.n > 1 else None,
+                "ci": list(cell.confidence_interval(confidence)) if cell.n > 1 else None,
+                "histogram": np.trim_zeros(cell.histogram, "b").tolist(),
+            }
+            for (n_players, strategy), cell in stats.items()
+        ]
+    }
+
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_text(json.dumps(summary))
+    temporary_path.replace(path)
@@ -0,0 +1,260 @@
+import argparse
+import sys
+from typing import Callable, Optional
+
+import numpy as np
+
+from simulation import simulate_game, minimal_distance_strategy
+
+# (pile tops, hand, hand length, played cards per pile, generator) -> (piles, slots) for every game in the batch
+BatchStrategy = Callable[
+    [np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.random.Generator],
+    tuple[np.ndarray, np.ndarray]
+]
+
+NUM_CARDS = 98
+# sentinel for empty hand slots, it is never a valid move on any pile
+EMPTY = 0
+
+
+def num_cards_per_player(num_players: int) -> int:
+    if num_players == 1:
+        return 8
+    elif num_players == 2:
+        return 7
+    else:
+        return 6
+
+
+def shuffled_decks(n_games: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Returns an (n_games, 98) matrix where every row is a shuffled deck of the cards 2 to 99.
+    """
+    return rng.permuted(np.tile(np.arange(2, 100, dtype=np.int16), (n_games, 1)), axis=1)
+
+
+def valid_moves(tops: np.ndarray, hand: np.ndarray, hand_len: np.ndarray) -> np.ndarray:
+    """
+    Returns a (games, 4, hand) mask of all cards in the hand which can be played on each pile.
+    """
+    in_hand = np.arange(hand.shape[1])[np.newaxis, :] < hand_len[:, np.newaxis]
+    cards = hand[:, np.newaxis, :]
+    ascending = cards > tops[:, :2, np.newaxis]
+    descending = cards < tops[:, 2:, np.newaxis]
+    return np.concatenate([ascending, descending], axis=1) & in_hand[:, np.newaxis, :]
+
+
+def weighted_choice(weights: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Picks one (pile, slot) per game with probability proportional to the (games, 4, hand) weights.
+    Also returns whether any move had a weight at all.
+    """
+    flat = weights.reshape(len(weights), -1)
+    cumulative = np.cumsum(flat, axis=1)
+    total = cumulative[:, -1]
+    threshold = rng.random(len(weights)) * total
+    choice = (cumulative > threshold[:, np.newaxis]).argmax(axis=1)
+    pile, slot = np.divmod(choice, weights.shape[2])
+    return pile, slot, total > 0
+
+
+def random_strategy(
+        tops: np.ndarray,
+        hand: np.ndarray,
+        hand_len: np.ndarray,
+        played: np.ndarray,
+        rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Picks any valid card at random and puts it on a random (but allowed) pile.
+    """
+    pile, slot, any_valid = weighted_choice(valid_moves(tops, hand, hand_len).astype(np.int32), rng)
+    return np.where(any_valid, pile, 0), np.where(any_valid, slot, 0)
+
+
+def minimal_distance_strategy_batch(
+        tops: np.ndarray,
+        hand: np.ndarray,
+        hand_len: np.ndarray,
+        played: np.ndarray,
+        rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Picks the card with the least distance to any of the piles and puts it on that pile.
+    """
+    in_hand = np.arange(hand.shape[1])[np.newaxis, :] < hand_len[:, np.newaxis]
+    lowest = np.where(in_hand, hand, 101).argmin(axis=1)
+    highest = np.where(in_hand, hand, -1).argmax(axis=1)
+    rows = np.arange(len(hand))
+
+    min_ascending = tops[:, :2].min(axis=1)
+    max_descending = tops[:, 2:].max(axis=1)
+    play_ascending = np.abs(min_ascending - hand[rows, lowest]) < np.abs(max_descending - hand[rows, highest])
+
+    pile = np.where(
+        play_ascending,
+        np.where(tops[:, 0] == min_ascending, 0, 1),
+        np.where(tops[:, 2] == max_descending, 2, 3)
+    )
+    return pile, np.where(play_ascending, lowest, highest)
+
+
+def trick_strategy(
+        tops: np.ndarray,
+        hand: np.ndarray,
+        hand_len: np.ndarray,
+        played: np.ndarray,
+        rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Tries to play cards such that in a consecutive move we can use a jump 10 (as specified in the tricks section).
+    """
+    in_hand = np.arange(hand.shape[1])[np.newaxis, :] < hand_len[:, np.newaxis]
+    rows = np.arange(len(hand))[:, np.newaxis, np.newaxis]
+    piles = np.arange(4)[np.newaxis, :, np.newaxis]
+    cards = hand.astype(np.int64)[:, np.newaxis, :]
+
+    # every card on a pile 10 apart from a hand card is a (possibly duplicate) candidate, regardless of validity
+    below = np.where(cards - 10 >= 1, played[rows, piles, np.clip(cards - 10, 0, 100)], False)
+    above = np.where(cards + 10 <= 100, played[rows, piles, np.clip(cards + 10, 0, 100)], False)
+    jumps = (below.astype(np.int32) + above) * in_hand[:, np.newaxis, :]
+
+    # otherwise, play either card of a pair 10 apart within the hand, on one of the first three piles
+    difference = np.abs(hand[:, np.newaxis, :].astype(np.int64) - hand[:, :, np.newaxis])
+    pairs = ((difference == 10) & in_hand[:, :, np.newaxis] & in_hand[:, np.newaxis, :]).sum(axis=2)
+    pair_moves = valid_moves(tops, hand, hand_len).astype(np.int32) * pairs[:, np.newaxis, :]
+    pair_moves[:, 3, :] = 0
+
+    jump_pile, jump_slot, any_jump = weighted_choice(jumps, rng)
+    pair_pile, pair_slot, any_pair = weighted_choice(pair_moves, rng)
+    random_pile, random_slot = random_strategy(tops, hand, hand_len, played, rng)
+
+    pile = np.where(any_jump, jump_pile, np.where(any_pair, pair_pile, random_pile))
+    slot = np.where(any_jump, jump_slot, np.where(any_pair, pair_slot, random_slot))
+    return pile, slot
+
+
+def simulate_games(
+        num_players: int,
+        strategy: BatchStrategy,
+        n_games: int,
+        rng: np.random.Generator,
+        decks: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Simulates a batch of games at once and returns the number of playable cards for every game.
+    Follows the rules of simulation.simulate_game, which is kept as the per-game reference implementation.
+
+    :param num_players: the number of players to simulate the games for.
+    :param strategy: the batched strategy to apply.
+    :param n_games: the number of games to simulate.
+    :param rng: the random generator used for shuffling and the strategies.
+    :param decks: optional (n_games, 98) decks to play, cards are drawn from the end of each row.
+    :return: the number of cards that could be played in each game.
+    """
+
+    if num_players < 1 or num_players > 7:
+        raise ValueError(f"Can't play a game with {num_players} players.")
+
+    if decks is None:
+        decks = shuffled_decks(n_games, rng)
+
+    num_cards = num_cards_per_player(num_players)
+    games = np.arange(n_games)
+
+    # pile tops and every card ever played per pile, the trick strategy looks at the whole pile
+    tops = np.tile(np.array([1, 1, 100, 100], dtype=np.int16), (n_games, 1))
+    played = np.zeros((n_games, 4, 101), dtype=bool)
+    played[:, :2, 1] = True
+    played[:, 2:, 100] = True
+
+    # hands are dealt in turn from the end of the deck, slots beyond hand_len are empty
+    hands = np.full((n_games, num_players, num_cards), EMPTY, dtype=np.int16)
+    for card in range(num_cards):
+        for player in range(num_players):
+            hands[:, player, card] = decks[:, NUM_CARDS - 1 - (card * num_players + player)]
+    hand_len = np.full((n_games, num_players), num_cards, dtype=np.int64)
+    deck_len = np.full(n_games, NUM_CARDS - num_players * num_cards, dtype=np.int64)
+
+    cards_played = np.zeros(n_games, dtype=np.int64)
+    running = np.ones(n_games, dtype=bool)
+    slots = np.arange(num_cards)[np.newaxis, :]
+
+    # The game is running so long as there are cards in the deck or player hands
+    while True:
+        running &= (deck_len > 0) & (hand_len.sum(axis=1) > 0)
+        if not running.any():
+            break
+
+        for player in range(num_players):
+            live = games[running]
+            if not len(live):
+                break
+
+            pile, slot = strategy(tops[live], hands[live, player], hand_len[live, player], played[live], rng)
+            card = hands[live, player, slot]
+
+            # Check if it is valid for the selected pile, otherwise the game is lost
+            top = tops[live, pile]
+            valid = (slot < hand_len[live, player]) & np.where(pile < 2, card > top, card < top)
+            running[live[~valid]] = False
+
+            live, pile, slot, card = live[valid], pile[valid], slot[valid], card[valid]
+            tops[live, pile] = card
+            played[live, pile, card] = True
+            cards_played[live] += 1
+
+            # Remove the card from the hand, keeping the order of the remaining cards
+            source = np.minimum(slots + (slots >= slot[:, np.newaxis]), num_cards - 1)
+            hands[live, player] = np.take_along_axis(hands[live, player], source, axis=1)
+            hand_len[live, player] -= 1
+
+            # Draw the card
+            drawing = live[deck_len[live] > 0]
+            hands[drawing, player, hand_len[drawing, player]] = decks[drawing, deck_len[drawing] - 1]
+            hand_len[drawing, player] += 1
+            deck_len[drawing] -= 1
+
+    return cards_played
+
+
+BATCH_STRATEGIES = {
+    "random": random_strategy,
+    "minimal": minimal_distance_strategy_batch,
+    "trick": trick_strategy,
+}
+
+
+def verify(num_players: int, n_games: int, rng: np.random.Generator) -> int:
+    """
+    Plays the same decks with the batched and the reference implementation of the (deterministic) minimal strategy.
+    Returns the number of games which differ.
+    """
+    decks = shuffled_decks(n_games, rng)
+    batch = simulate_games(num_players, minimal_distance_strategy_batch, n_games, rng, decks=decks)
+    reference = [simulate_game(num_players, minimal_distance_strategy, deck=deck.tolist()) for deck in decks]
+    return int(np.sum(batch != np.array(reference)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("num_players", type=int)
+    parser.add_argument("--strategy", type=str, default="random", choices=list(BATCH_STRATEGIES), nargs="?")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verify", action="store_true", help="Compare against the reference implementation")
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(args.seed)
+
+    if args.verify:
+        mismatches = verify(args.num_players, args.games, generator)
+        print(f"{mismatches} of {args.games} games differ from the reference implementation.", file=sys.stderr)
+        sys.exit(1 if mismatches else 0)
+
+    results = simulate_games(args.num_players, BATCH_STRATEGIES[args.strategy], args.games, generator)
+    print(
+        f"Simulated {args.games} games with {args.num_players} players and {args.strategy} strategy. "
+        f"Played {results.mean():.2f} cards on average.",
+        file=sys.stderr
+    )
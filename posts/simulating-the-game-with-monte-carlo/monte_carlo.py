@@ -1,23 +1,237 @@
 import argparse
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
+from os import cpu_count
+from pathlib import Path
 
-from simulation import simulate_game, random_strategy, minimal_distance_strategy, trick_strategy
+import numpy as np
+
+from aggregation import MAX_CARDS_PLAYED, RunningStats, write_summary
+from batch_simulation import BATCH_STRATEGIES, simulate_games
+from simulation import STRATEGIES, RegisteredStrategy
+
+Shard = tuple[int, str, int, str, np.random.SeedSequence]
+
+# the strategies compared in the post, further registered ones only run when asked for
+BASELINE_STRATEGIES = ["random", "minimal", "trick"]
+
+
+def make_shards(
+        players: list[int],
+        strategies: list[str],
+        repeats: int,
+        shard_size: int,
+        engine: str,
+        seed_sequence: np.random.SeedSequence
+) -> list[Shard]:
+    """
+    Splits the (players, strategy, repeat) grid into shards of at most shard_size games.
+    Every shard gets its own seed spawned from the seed sequence, so results don't depend on the number of workers.
+    """
+    grid = [
+        (n_players, strategy, min(shard_size, repeats - start))
+        for n_players, strategy in product(players, strategies)
+        for start in range(0, repeats, shard_size)
+    ]
+    return [
+        (n_players, strategy, n_games, engine, shard_seed)
+        for (n_players, strategy, n_games), shard_seed in zip(grid, seed_sequence.spawn(len(grid)))
+    ]
+
+
+def run_shard(shard: Shard) -> list[int]:
+    n_players, strategy, n_games, engine, shard_seed = shard
+
+    if engine == "batch":
+        return simulate_games(n_players, BATCH_STRATEGIES[strategy], n_games, np.random.default_rng(shard_seed)).tolist()
+
+    # the reference strategies draw from the module level generator, a shard always runs within a single process
+    random.seed(int(shard_seed.generate_state(1, np.uint64)[0]))
+    return [STRATEGIES[strategy].simulate(n_players) for _ in range(n_games)]
+
+
+def run_shard_histogram(shard: Shard) -> np.ndarray:
+    return np.bincount(run_shard(shard), minlength=MAX_CARDS_PLAYED + 1)
+
+
+def run_summary(
+        executor: ProcessPoolExecutor,
+        players: list[int],
+        strategies: list[str],
+        args: argparse.Namespace,
+        seed_sequence: np.random.SeedSequence
+) -> dict[tuple[int, str], RunningStats]:
+    """
+    Simulates games in rounds and only keeps a histogram and running statistics per (n_players, strategy).
+    Every round adds shards_per_round shards to each cell which has neither reached --repeats games
+    nor (with --ci-width) a narrow enough confidence interval. Every cell spawns its shard seeds in order,
+    so the result doesn't depend on the number of workers.
+    """
+    cells = list(product(players, strategies))
+    cell_seeds = dict(zip(cells, seed_sequence.spawn(len(cells))))
+    stats = {cell: RunningStats() for cell in cells}
+    scheduled = {cell: 0 for cell in cells}
+    rounds = 0
+
+    while True:
+        pending = [
+            cell for cell in cells
+            if scheduled[cell] < args.repeats
+            and not (args.ci_width is not None and stats[cell].converged(args.ci_width, args.confidence))
+        ]
+        if not pending:
+            break
+
+        shards = []
+        for n_players, strategy in pending:
+            for shard_seed in cell_seeds[(n_players, strategy)].spawn(args.shards_per_round):
+                n_games = min(args.shard_size, args.repeats - scheduled[(n_players, strategy)])
+                if n_games <= 0:
+                    break
+
+                scheduled[(n_players, strategy)] += n_games
+                shards.append((n_players, strategy, n_games, args.engine, shard_seed))
+
+        for (n_players, strategy, *_), histogram in zip(shards, executor.map(run_shard_histogram, shards)):
+            stats[(n_players, strategy)].update(histogram)
+
+        rounds += 1
+        if rounds % args.checkpoint_every == 0:
+            write_summary(args.summary_file, stats, args.confidence)
+
+    write_summary(args.summary_file, stats, args.confidence, finished=True)
+    return stats
+
+
+def timed(registered: RegisteredStrategy, latencies: list[int]) -> RegisteredStrategy:
+    """
+    Wraps a strategy such that the duration of every call is appended to latencies (in nanoseconds).
+    """
+    strategy = registered.strategy
+
+    def timed_strategy(state, player):
+        start = time.perf_counter_ns()
+        move = strategy(state, player)
+        latencies.append(time.perf_counter_ns() - start)
+        return move
+
+    return registered._replace(strategy=timed_strategy)
+
+
+def bench(strategies: list[str], players: list[int], games: int, seed: int) -> list[list]:
+    """
+    Measures games per second, mean cards played and per call strategy latency percentiles.
+    Throughput is measured on a plain run, latencies on a second, instrumented run.
+    """
+    rows = []
+
+    for strategy, n_players in product(strategies, players):
+        registered = STRATEGIES[strategy]
+
+        random.seed(seed)
+        start = time.perf_counter()
+        cards_played = [registered.simulate(n_players) for _ in range(games)]
+        elapsed = time.perf_counter() - start
+
+        latencies = []
+        instrumented = timed(registered, latencies)
+        random.seed(seed)
+        for _ in range(games):
+            instrumented.simulate(n_players)
+
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) / 1000
+        rows.append([strategy, n_players, games / elapsed, np.mean(cards_played), p50, p90, p99])
+
+    return rows
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def add_run_arguments(parser: argparse.ArgumentParser, suppress_defaults: bool = False):
+    """
+    Adds the options of the run command. Without defaults, options given before the command aren't overwritten.
+    """
+    def default(value):
+        return argparse.SUPPRESS if suppress_defaults else value
+
+    parser.add_argument("--repeats", default=default(1000), type=int, nargs="?")
+    parser.add_argument("--engine", default=default("reference"), choices=["reference", "batch"])
+    parser.add_argument("--strategies", nargs="+", default=default(BASELINE_STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--workers", default=default(cpu_count()), type=int)
+    parser.add_argument("--shard-size", default=default(1000), type=positive_int, help="Number of games per shard")
+    parser.add_argument("--seed", default=default(None), type=int, help="Seed for reproducible runs, independent of --workers")
+    parser.add_argument(
+        "--output",
+        default=default("games"),
+        choices=["games", "summary"],
+        help="Print one line per game or only aggregate a summary per number of players and strategy"
+    )
+    parser.add_argument("--summary-file", default=default(Path("simulation.summary.json")), type=Path)
+    parser.add_argument("--shards-per-round", default=default(4), type=positive_int, help="Shards added to every cell per summary round")
+    parser.add_argument("--checkpoint-every", default=default(1), type=positive_int, help="Write the summary every n rounds")
+    parser.add_argument("--ci-width", default=default(None), type=float, help="Stop a cell once its confidence interval is this narrow")
+    parser.add_argument("--confidence", default=default(0.95), type=float)
 
-_STRATEGY_TO_CB = {
-    "random": random_strategy,
-    "minimal": minimal_distance_strategy,
-    "trick": trick_strategy
-}
 
 if __name__ == "__main__":
+    # the options of run are also accepted without a command, so that the original invocation keeps working
     parser = argparse.ArgumentParser()
-    parser.add_argument("--repeats", default=1000, type=int, nargs="?")
+    add_run_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    parser.set_defaults(command="run")
+
+    run_parser = subparsers.add_parser("run", help="Simulate games for every number of players and strategy (default)")
+    add_run_arguments(run_parser, suppress_defaults=True)
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the throughput of every registered strategy")
+    bench_parser.add_argument("--games", default=2000, type=int, help="Number of games per strategy and number of players")
+    bench_parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    bench_parser.add_argument("--players", nargs="+", default=list(range(1, 8)), type=int)
+    bench_parser.add_argument("--seed", default=0, type=int)
+
     args = parser.parse_args()
 
-    strategies = ["random", "minimal", "trick"]
+    if args.command == "bench":
+        columns = ["strategy", "players", "games/s", "mean cards", "p50 µs", "p90 µs", "p99 µs"]
+        print("".join(f"{column:>12}" for column in columns))
+        for strategy, n_players, games_per_second, mean, p50, p90, p99 in bench(args.strategies, args.players, args.games, args.seed):
+            print(
+                f"{strategy:>12}{n_players:>12}{games_per_second:>12.0f}{mean:>12.2f}"
+                f"{p50:>12.2f}{p90:>12.2f}{p99:>12.2f}"
+            )
+        sys.exit(0)
+
+    strategies = args.strategies
+
+    if args.engine == "batch" and not set(strategies) <= set(BATCH_STRATEGIES):
+        parser.error(f"The batch engine only supports the strategies {', '.join(BATCH_STRATEGIES)}.")
+
     players = list(range(1, 8))
 
-    for i in range(args.repeats):
-        for n_players, strategy in product(players, strategies):
-            cards_played_total = simulate_game(n_players, _STRATEGY_TO_CB[strategy])
-            print("\t".join([str(item) for item in [n_players, strategy, cards_played_total]]))
+    seed_sequence = np.random.SeedSequence(args.seed)
+    print(f"Seed: {seed_sequence.entropy}", file=sys.stderr)
+
+    if args.output == "summary":
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            summary = run_summary(executor, players, strategies, args, seed_sequence)
+
+        for (n_players, strategy), cell in summary.items():
+            low, high = cell.confidence_interval(args.confidence)
+            print("\t".join([str(item) for item in [n_players, strategy, cell.n, f"{cell.mean:.3f}", f"{low:.3f}", f"{high:.3f}"]]))
+        sys.exit(0)
+
+    shards = make_shards(players, strategies, args.repeats, args.shard_size, args.engine, seed_sequence)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # results are consumed in shard order, whichever worker finishes first
+        for (n_players, strategy, *_), shard_results in zip(shards, executor.map(run_shard, shards)):
+            for cards_played_total in shard_results:
+                print("\t".join([str(item) for item in [n_players, strategy, cards_played_total]]))
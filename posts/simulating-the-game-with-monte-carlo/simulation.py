@@ -1,163 +1,361 @@
 import argparse
 import random
 import sys
-from itertools import chain, combinations
-from operator import gt, lt
-from typing import Callable
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, NamedTuple, Optional
 
-Game = tuple[list[int], list[int], list[int], list[int]]
 Move = tuple[int, int]
-Strategy = Callable[[Game, list[int]], Move]
+Strategy = Callable[["GameState", int], Move]
+# plays several cards in one turn, every index refers to the hand after the previous moves of the turn
+TurnStrategy = Callable[["GameState", int], list[Move]]
 
+_FULL_DECK = list(range(2, 100))
 
-def simulate_game(num_players: int, strategy: Strategy) -> int:
+
+class GameState:
+    """
+    The state of a single game: pile tops, the history of every pile as a bitmask and a sorted hand per player,
+    also as a bitmask. All counters are kept up to date incrementally, so a turn neither rescans the piles
+    nor allocates new lists.
+    """
+
+    __slots__ = (
+        "tops", "played", "hands", "hand_bits", "deck", "deck_remaining", "shuffled", "cards_in_hands", "cards_played"
+    )
+
+    def __init__(self, num_players: int, deck: Optional[list[int]] = None):
+        if num_players < 1 or num_players > 7:
+            raise ValueError(f"Can't play a game with {num_players} players.")
+
+        self.tops = [1, 1, 100, 100]
+        # bit n is set if card n has been played on the pile
+        self.played = [1 << 1, 1 << 1, 1 << 100, 1 << 100]
+
+        # Initialize the player decks
+        if num_players == 1:
+            num_cards = 8
+        elif num_players == 2:
+            num_cards = 7
+        else:
+            num_cards = 6
+
+        # Without a deck, cards are drawn uniformly from the remaining ones (a lazy Fisher-Yates shuffle)
+        self.shuffled = deck is not None
+        self.deck = list(deck) if deck is not None else _FULL_DECK[:]
+        self.deck_remaining = len(self.deck) - num_players * num_cards
+
+        if not self.shuffled:
+            cards = self.deck
+            uniform = random.random
+            for last in range(len(cards) - 1, self.deck_remaining - 1, -1):
+                index = int(uniform() * (last + 1))
+                cards[index], cards[last] = cards[last], cards[index]
+
+        # cards are dealt in turn from the end of the deck
+        dealt = self.deck[self.deck_remaining:][::-1]
+        self.hands = [sorted(dealt[player::num_players]) for player in range(num_players)]
+        # bit n is set if card n is in the hand
+        self.hand_bits = [sum(1 << card for card in hand) for hand in self.hands]
+
+        self.cards_in_hands = num_players * num_cards
+        self.cards_played = 0
+
+    def draw(self) -> int:
+        deck = self.deck
+        self.deck_remaining -= 1
+        last = self.deck_remaining
+
+        if not self.shuffled:
+            # the bias of scaling random() is far below anything a simulation could pick up
+            index = int(random.random() * (last + 1))
+            deck[index], deck[last] = deck[last], deck[index]
+
+        return deck[last]
+
+    @staticmethod
+    def is_valid(pile: int, card: int, top: int) -> bool:
+        # the first two piles ascend, the last two descend
+        return card > top if pile < 2 else card < top
+
+    def valid_ranges(self, player: int) -> tuple[tuple[int, int], ...]:
+        """
+        Returns for every pile the (start, stop) range of hand indices which can be played on it.
+        Since hands are sorted, these are a suffix for ascending and a prefix for descending piles.
+        """
+        hand = self.hands[player]
+        tops = self.tops
+        return (
+            (bisect_right(hand, tops[0]), len(hand)),
+            (bisect_right(hand, tops[1]), len(hand)),
+            (0, bisect_left(hand, tops[2])),
+            (0, bisect_left(hand, tops[3])),
+        )
+
+    def valid_moves(self, player: int) -> list[Move]:
+        return [
+            (pile, index)
+            for pile, (start, stop) in enumerate(self.valid_ranges(player))
+            for index in range(start, stop)
+        ]
+
+    def has_played(self, pile: int, card: int) -> bool:
+        return 1 <= card <= 100 and bool(self.played[pile] >> card & 1)
+
+    def play(self, player: int, pile: int, index: int, draw: bool = True) -> bool:
+        """
+        Plays the card at the index of the players (sorted) hand on the pile and draws a new card.
+        Returns False if the move is invalid, which loses the game.
+        Without draw, the card is only replaced by a later call to refill.
+        """
+        hand = self.hands[player]
+        card = hand.pop(index)
+        bit = 1 << card
+        self.hand_bits[player] ^= bit
+        self.cards_in_hands -= 1
+
+        # Check if it is valid for the selected pile (the first two piles ascend, the last two descend)
+        top = self.tops[pile]
+        if (card <= top) if pile < 2 else (card >= top):
+            return False
+
+        self.tops[pile] = card
+        self.played[pile] |= bit
+        self.cards_played += 1
+
+        # Draw the card
+        if draw and self.deck_remaining:
+            card = self.draw()
+            insort(hand, card)
+            self.hand_bits[player] |= 1 << card
+            self.cards_in_hands += 1
+
+        return True
+
+    def refill(self, player: int, num_cards: int):
+        hand = self.hands[player]
+        for _ in range(min(num_cards, self.deck_remaining)):
+            card = self.draw()
+            insort(hand, card)
+            self.hand_bits[player] |= 1 << card
+            self.cards_in_hands += 1
+
+
+def simulate_game(num_players: int, strategy: Strategy, deck: Optional[list[int]] = None) -> int:
     """
     Simulates a game and returns the number of playable cards.
+    A game only lasts a handful of turns, so dealing costs about as much as playing and a single game in pure Python
+    is only about twice as fast as with the original list-based state. For throughput, batch_simulation plays
+    thousands of games at once.
 
     :param num_players: the number of players to simulate the game for.
     :param strategy: the strategy to apply.
+    :param deck: an optional shuffled deck to play, cards are drawn from the end.
     :return: the number of cards that could be played.
     """
 
-    if num_players < 1 or num_players > 7:
-        raise ValueError(f"Can't play a game with {num_players} players.")
+    state = GameState(num_players, deck)
+    players = range(num_players)
+    play = state.play
 
-    # Initialize the game
-    game = ([1], [1], [100], [100])
-    deck = list(range(2, 100))
-    random.shuffle(deck)
+    # The game is running so long as there are cards in the deck or player hands
+    while state.deck_remaining and state.cards_in_hands:
+        for player in players:
+            # Choose the pile and card to play using the strategy
+            deck_to_play, card_to_play = strategy(state, player)
 
-    # Initialize the player decks
-    if num_players == 1:
-        num_cards = 8
-    elif num_players == 2:
-        num_cards = 7
-    else:
-        num_cards = 6
+            if not play(player, deck_to_play, card_to_play):
+                return state.cards_played
 
-    player_hands = [[] for _ in range(num_players)]
-    for _ in range(num_cards):
-        for hand in player_hands:
-            hand.append(deck.pop())
+    return state.cards_played
 
-    # Start playing the game
-    cards_played = 0
-    game_running = True
 
-    # The game is running so long as there are cards in the deck or player hands
-    while len(deck) and len(list(chain.from_iterable(player_hands))) and game_running:
-        for hand in player_hands:
-            # Choose the deck and card to play using the strategy
-            deck_to_play, card_to_play = strategy(
-                game,
-                hand
-            )
+def simulate_turns(num_players: int, strategy: TurnStrategy, deck: Optional[list[int]] = None) -> int:
+    """
+    Simulates a game in which players may put down several cards per turn and returns the number of playable cards.
+    Players refill their hand at the end of their turn, players without cards are skipped.
 
-            # Draw the card
-            card = hand.pop(card_to_play)
+    :param num_players: the number of players to simulate the game for.
+    :param strategy: the turn strategy to apply, it has to play at least one card.
+    :param deck: an optional shuffled deck to play, cards are drawn from the end.
+    :return: the number of cards that could be played.
+    """
 
-            # Check if it is valid for the selected deck
-            comparator = gt if deck_to_play < 2 else lt
-            if comparator(card, game[deck_to_play][-1]):
-                game[deck_to_play].append(card)
-                cards_played += 1
+    state = GameState(num_players, deck)
+    players = range(num_players)
 
-                if len(deck):
-                    hand.append(deck.pop())
-            else:
-                game_running = False
-                break
+    while state.deck_remaining and state.cards_in_hands:
+        for player in players:
+            if not state.hands[player]:
+                continue
 
-    return cards_played
+            moves = strategy(state, player)
+            if not moves:
+                return state.cards_played
 
+            for deck_to_play, card_to_play in moves:
+                if not state.play(player, deck_to_play, card_to_play, draw=False):
+                    return state.cards_played
 
-def random_strategy(game: Game, hand: list[int]) -> Move:
+            state.refill(player, len(moves))
+
+    return state.cards_played
+
+
+class RegisteredStrategy(NamedTuple):
+    name: str
+    strategy: Strategy | TurnStrategy
+    multi_card: bool
+
+    def simulate(self, num_players: int, deck: Optional[list[int]] = None) -> int:
+        if self.multi_card:
+            return simulate_turns(num_players, self.strategy, deck=deck)
+
+        return simulate_game(num_players, self.strategy, deck=deck)
+
+
+STRATEGIES: dict[str, RegisteredStrategy] = {}
+
+
+def register_strategy(name: str, multi_card: bool = False):
+    """
+    Registers a strategy under a name, so it can be picked by the simulation scripts.
+    Multi card strategies are turn strategies which return a list of moves.
+    """
+    def register(strategy):
+        if name in STRATEGIES:
+            raise ValueError(f"A strategy named {name} is already registered.")
+
+        STRATEGIES[name] = RegisteredStrategy(name, strategy, multi_card)
+        return strategy
+
+    return register
+
+
+@register_strategy("random")
+def random_strategy(state: GameState, player: int) -> Move:
     """
     Picks any valid card at random and puts it on a random (but allowed) pile.
     """
-    valid_cards = []
-    for index, g in enumerate(game):
-        comparator = gt if index < 2 else lt
-        for index_card, card in enumerate(hand):
-            if comparator(card, g[-1]):
-                valid_cards.append((index, index_card))
+    ranges = state.valid_ranges(player)
+    (start0, stop0), (start1, stop1), (start2, stop2), (start3, stop3) = ranges
+    total = stop0 - start0 + stop1 - start1 + stop2 - start2 + stop3 - start3
 
-    if len(valid_cards):
-        deck_to_play, card_to_play = random.choice(valid_cards)
-        return deck_to_play, card_to_play
-    else:
-        return 0, 0
+    if total:
+        choice = random.randrange(total)
+        for deck_to_play, (start, stop) in enumerate(ranges):
+            if choice < stop - start:
+                return deck_to_play, start + choice
+            choice -= stop - start
+
+    return 0, 0
 
 
-def minimal_distance_strategy(game: Game, hand: list[int]) -> Move:
+@register_strategy("minimal")
+def minimal_distance_strategy(state: GameState, player: int) -> Move:
     """
     Picks the card with the least distance to any of the piles and puts it on that pile.
     """
-    ascending_values = [game[0][-1], game[1][-1]]
-    min_ascending = min(ascending_values)
-    descending_values = [game[2][-1], game[3][-1]]
-    max_descending = max(descending_values)
+    tops = state.tops
+    hand = state.hands[player]
+    min_ascending = min(tops[0], tops[1])
+    max_descending = max(tops[2], tops[3])
 
-    sorted_hand = sorted(hand)
-    if abs(min_ascending - sorted_hand[0]) < abs(max_descending - sorted_hand[-1]):
-        card_to_play = hand.index(sorted_hand[0])
-        if game[0][-1] == min_ascending:
-            return 0, card_to_play
-        else:
-            return 1, card_to_play
+    if abs(min_ascending - hand[0]) < abs(max_descending - hand[-1]):
+        return (0 if tops[0] == min_ascending else 1), 0
     else:
-        card_to_play = hand.index(sorted_hand[-1])
-        if game[2][-1] == max_descending:
-            return 2, card_to_play
-        else:
-            return 3, card_to_play
+        return (2 if tops[2] == max_descending else 3), len(hand) - 1
 
 
-def trick_strategy(game: Game, hand: list[int]) -> Move:
+@register_strategy("trick")
+def trick_strategy(state: GameState, player: int) -> Move:
     """
     Tries to play cards such that in a consecutive move we can use a jump 10 (as specified in the tricks section).
     """
-    possible_cards = []
+    hand = state.hands[player]
+    hand_bits = state.hand_bits[player]
 
-    for game_index, g in enumerate(game):
-        for card_deck in g:
-            for card_index, card in enumerate(hand):
-                if abs(card_deck - card) == 10:
-                    possible_cards.append((game_index, card_index))
+    # every card on a pile 10 apart from a hand card is a candidate (twice if both directions match),
+    # one is drawn uniformly by counting the candidates instead of listing them
+    jumps = [
+        (game_index, (played << 10) & hand_bits, (played >> 10) & hand_bits)
+        for game_index, played in enumerate(state.played)
+    ]
+    total = 0
+    for _, below, above in jumps:
+        total += below.bit_count() + above.bit_count()
 
-    if len(possible_cards):
-        return random.choice(possible_cards)
+    if total:
+        choice = random.randrange(total)
+        for game_index, below, above in jumps:
+            for candidates in (below, above):
+                count = candidates.bit_count()
+                if choice < count:
+                    for _ in range(choice):
+                        candidates &= candidates - 1
+                    card = (candidates & -candidates).bit_length() - 1
+                    return game_index, bisect_left(hand, card)
+                choice -= count
 
-    for card1, card2 in combinations(hand, 2):
-        if abs(card1 - card2) == 10:
-            for index in range(3):
-                comparator = gt if index < 2 else lt
-                if comparator(card1, game[index][-1]):
-                    possible_cards.append((index, hand.index(card1)))
+    possible_cards = []
+
+    # otherwise play either card of a pair 10 apart within the hand, once per pair it is part of
+    with_higher = (hand_bits >> 10) & hand_bits
+    with_lower = (hand_bits << 10) & hand_bits
+
+    if with_higher:
+        for card_index, card1 in enumerate(hand):
+            pairs = (with_higher >> card1 & 1) + (with_lower >> card1 & 1)
+            if pairs:
+                for index in range(3):
+                    if state.is_valid(index, card1, state.tops[index]):
+                        possible_cards.extend([(index, card_index)] * pairs)
 
     if len(possible_cards):
         return random.choice(possible_cards)
     else:
-        return random_strategy(game, hand)
+        return random_strategy(state, player)
+
+
+@register_strategy("greedy", multi_card=True)
+def greedy_strategy(state: GameState, player: int, max_distance: int = 3) -> list[Move]:
+    """
+    Plays the card with the least distance to any pile, and keeps playing as long as the next card is close.
+    """
+    tops = list(state.tops)
+    hand = list(state.hands[player])
+    moves = []
+
+    while hand:
+        valid = [
+            (card - top if pile < 2 else top - card, pile, index)
+            for pile, top in enumerate(tops)
+            for index, card in enumerate(hand)
+            if GameState.is_valid(pile, card, top)
+        ]
+
+        if not valid:
+            # a turn needs at least one card, without a valid one the game is lost
+            if not moves:
+                moves.append((0, 0))
+            break
+
+        distance, deck_to_play, card_to_play = min(valid)
+        if moves and distance > max_distance:
+            break
+
+        moves.append((deck_to_play, card_to_play))
+        tops[deck_to_play] = hand.pop(card_to_play)
+
+    return moves
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("num_players", type=int)
-    parser.add_argument("--strategy", type=str, default="random", choices=["random", "minimal", "trick"], nargs="?")
+    parser.add_argument("--strategy", type=str, default="random", choices=list(STRATEGIES), nargs="?")
     args = parser.parse_args()
 
-    match args.strategy:
-        case "random":
-            player_strategy = random_strategy
-        case "minimal":
-            player_strategy = minimal_distance_strategy
-        case "trick":
-            player_strategy = trick_strategy
-        case _:
-            player_strategy = random_strategy
-
-    cards_played_total = simulate_game(args.num_players, player_strategy)
+    cards_played_total = STRATEGIES[args.strategy].simulate(args.num_players)
     print(
         f"Simulated game with {args.num_players} players and {args.strategy} strategy. Played {cards_played_total}.",
         file=sys.stderr
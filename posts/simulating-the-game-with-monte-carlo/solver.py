@@ -0,0 +1,288 @@
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from batch_simulation import shuffled_decks
+from simulation import STRATEGIES, GameState, Move
+
+# strategies playing by the solver's rules, one card per turn, multi-card ones can score more than its optimum
+SINGLE_CARD_STRATEGIES = {name: registered for name, registered in STRATEGIES.items() if not registered.multi_card}
+
+
+class SolveResult(NamedTuple):
+    best: int
+    upper_bound: int
+    exact: bool
+    nodes: int
+    moves: list[Move]
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Solver:
+    """
+    Finds the maximum number of cards that can be played for a known deck, under the rules of simulate_game.
+
+    The search is an iterative deepening over the number of cards to play: every iteration is a depth-first search
+    proving (or refuting) that a target can be reached. Proven and refuted targets are kept in a transposition table
+    keyed by a canonical state (piles of the same direction are interchangeable), which persists across iterations.
+    Branches are pruned when the cards still playable on the pile tops, or the remaining turns, can't reach the target.
+    """
+
+    def __init__(
+            self,
+            num_players: int,
+            deck: list[int],
+            node_budget: Optional[int] = None,
+            time_budget: Optional[float] = None
+    ):
+        state = GameState(num_players, deck)
+
+        self.num_players = num_players
+        self.deck = state.deck
+        self.deck_remaining = state.deck_remaining
+        self.tops = list(state.tops)
+        self.hands = [sum(1 << card for card in hand) for hand in state.hands]
+        self.unplayed = sum(self.hands) | sum(1 << card for card in self.deck[:self.deck_remaining])
+        self.player = 0
+
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.nodes = 0
+        self.deadline = None
+
+        # canonical state -> highest target proven reachable / lowest target proven unreachable,
+        # reachable targets with their first move as (canonical pile, card), see canonical_pile
+        self.reachable: dict[tuple, tuple[int, Optional[tuple[int, int]]]] = {}
+        self.unreachable: dict[tuple, int] = {}
+
+    def key(self) -> tuple:
+        tops = self.tops
+        return (
+            min(tops[0], tops[1]), max(tops[0], tops[1]), min(tops[2], tops[3]), max(tops[2], tops[3]),
+            self.deck_remaining, self.player, *self.hands
+        )
+
+    def canonical_pile(self, pile: int) -> int:
+        """
+        Numbers the piles as in key(), the lower top of each direction first, so that a stored move
+        applies to every state with the same key, whichever of its interchangeable piles holds which top.
+        """
+        base = pile & 2
+        return base + (self.tops[pile] > self.tops[pile ^ 1])
+
+    def concrete_pile(self, canonical: int) -> int:
+        """
+        The inverse of canonical_pile for the current state, of two piles with the same top the first.
+        """
+        base = canonical & 2
+        lower = base if self.tops[base] <= self.tops[base + 1] else base + 1
+        return lower if canonical == base else lower ^ 1
+
+    def upper_bound(self) -> int:
+        """
+        Bounds the cards that can still be played from the current state.
+        """
+        tops = self.tops
+        # pile tops only ever move towards the end, so cards which fit no pile now never will
+        above = self.unplayed & ~((1 << (min(tops[0], tops[1]) + 1)) - 1)
+        below = self.unplayed & ((1 << max(tops[2], tops[3])) - 1)
+        playable = (above | below).bit_count()
+
+        # the game stops at the start of the round in which the deck ran out
+        if not self.deck_remaining:
+            turns = 0 if self.player == 0 else self.num_players - self.player
+        else:
+            last_draw = (self.player + self.deck_remaining - 1) % self.num_players
+            turns = self.deck_remaining + self.num_players - 1 - last_draw
+
+        return min(playable, turns)
+
+    def moves(self) -> list[tuple[int, int]]:
+        """
+        All valid (pile, card) moves of the current player, closest to the pile top first.
+        Of two piles with the same top only one is tried.
+        """
+        hand = self.hands[self.player]
+        tops = self.tops
+        moves = []
+
+        for pile in range(4):
+            top = tops[pile]
+            if (pile == 1 and top == tops[0]) or (pile == 3 and top == tops[2]):
+                continue
+
+            candidates = hand >> (top + 1) << (top + 1) if pile < 2 else hand & ((1 << top) - 1)
+            while candidates:
+                card = (candidates & -candidates).bit_length() - 1
+                candidates &= candidates - 1
+                moves.append((abs(card - top), pile, card))
+
+        moves.sort()
+        return [(pile, card) for _, pile, card in moves]
+
+    def play(self, pile: int, card: int) -> tuple[int, int, Optional[int]]:
+        """
+        Plays the card of the current player and draws a new one, returns what is needed to undo the move.
+        """
+        player = self.player
+        top = self.tops[pile]
+        bit = 1 << card
+        self.hands[player] ^= bit
+        self.unplayed ^= bit
+        self.tops[pile] = card
+
+        drawn = None
+        if self.deck_remaining:
+            self.deck_remaining -= 1
+            drawn = 1 << self.deck[self.deck_remaining]
+            self.hands[player] |= drawn
+
+        self.player = (player + 1) % self.num_players
+        return pile, top, drawn
+
+    def undo(self, card: int, undo: tuple[int, int, Optional[int]]):
+        pile, top, drawn = undo
+        self.player = (self.player - 1) % self.num_players
+        player = self.player
+
+        if drawn is not None:
+            self.hands[player] ^= drawn
+            self.deck_remaining += 1
+
+        self.tops[pile] = top
+        self.unplayed ^= 1 << card
+        self.hands[player] ^= 1 << card
+
+    def reach(self, target: int) -> bool:
+        """
+        Returns whether target more cards can be played from the current state.
+        """
+        if target <= 0:
+            return True
+
+        self.nodes += 1
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            raise BudgetExceeded()
+        if self.deadline is not None and not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise BudgetExceeded()
+
+        if not self.deck_remaining and self.player == 0:
+            return False
+
+        if self.upper_bound() < target:
+            return False
+
+        key = self.key()
+        if self.reachable.get(key, (0, None))[0] >= target:
+            return True
+        if self.unreachable.get(key, sys.maxsize) <= target:
+            return False
+
+        for pile, card in self.moves():
+            undo = self.play(pile, card)
+            try:
+                found = self.reach(target - 1)
+            finally:
+                # also when the budget runs out, so the line can be replayed from the root
+                self.undo(card, undo)
+
+            if found:
+                # the move is kept to replay the line, it also reaches any lower target
+                self.reachable[key] = (target, (self.canonical_pile(pile), card))
+                return True
+
+        self.unreachable[key] = min(self.unreachable.get(key, sys.maxsize), target)
+        return False
+
+    def line(self, target: int) -> list[Move]:
+        """
+        Replays the moves stored in the transposition table for a reached target, as (pile, card).
+        """
+        moves, undos = [], []
+
+        for _ in range(target):
+            _, stored = self.reachable.get(self.key(), (0, None))
+            if stored is None:
+                break
+            canonical, card = stored
+            move = (self.concrete_pile(canonical), card)
+            assert move in self.moves(), f"The stored move {move} is not valid in the state it was replayed in"
+            moves.append(move)
+            undos.append((move[1], self.play(*move)))
+
+        for card, undo in reversed(undos):
+            self.undo(card, undo)
+
+        return moves
+
+    def solve(self, lower_bound: int = 0) -> SolveResult:
+        """
+        Deepens the target from lower_bound + 1 until it can't be reached or the budget is used up.
+
+        :param lower_bound: a number of cards known to be playable, e.g. from a heuristic strategy.
+        :return: the best number of cards found, an upper bound, whether it is exact and the moves as (pile, card).
+        """
+        if self.time_budget is not None:
+            self.deadline = time.perf_counter() + self.time_budget
+
+        best = max(lower_bound, 0)
+        upper_bound = self.upper_bound()
+        exact = True
+
+        try:
+            while best < upper_bound:
+                if not self.reach(best + 1):
+                    upper_bound = best
+                    break
+
+                best += 1
+        except BudgetExceeded:
+            exact = False
+
+        # only targets proven by the search itself have their moves in the table
+        return SolveResult(best, upper_bound, exact, self.nodes, self.line(best))
+
+
+def solve_deal(deal: tuple[int, list[int], Optional[int], Optional[float], int]) -> list:
+    num_players, deck, node_budget, time_budget, seed = deal
+
+    # the heuristic strategies on the same deal, their best result is the starting point of the search
+    random.seed(seed)
+    heuristics = [registered.simulate(num_players, deck=deck) for registered in SINGLE_CARD_STRATEGIES.values()]
+
+    result = Solver(num_players, deck, node_budget, time_budget).solve(lower_bound=max(heuristics))
+    return [num_players, result.best, result.upper_bound, int(result.exact), result.nodes, *heuristics]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("num_players", type=int)
+    parser.add_argument("--games", default=100, type=int)
+    parser.add_argument("--seed", default=None, type=int)
+    parser.add_argument("--node-budget", default=1_000_000, type=int, help="Maximum search nodes per deal")
+    parser.add_argument("--time-budget", default=None, type=float, help="Maximum search seconds per deal")
+    parser.add_argument("--workers", default=cpu_count(), type=int)
+    args = parser.parse_args()
+
+    seed_sequence = np.random.SeedSequence(args.seed)
+    print(f"Seed: {seed_sequence.entropy}", file=sys.stderr)
+
+    decks = shuffled_decks(args.games, np.random.default_rng(seed_sequence))
+    deals = [
+        (args.num_players, deck.tolist(), args.node_budget, args.time_budget, int(seed))
+        for deck, seed in zip(decks, seed_sequence.generate_state(args.games))
+    ]
+
+    print("\t".join(["num_players", "best", "upper_bound", "exact", "nodes", *SINGLE_CARD_STRATEGIES]))
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for row in executor.map(solve_deal, deals):
+            print("\t".join([str(item) for item in row]))
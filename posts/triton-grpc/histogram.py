@@ -0,0 +1,72 @@
+from typing import Optional
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies in microseconds in the style of HdrHistogram: values below 2048 have a bucket each,
+    above, every power of two is split into 1024 buckets. Every value is kept with a relative error below 0.1%,
+    in a fixed number of counters no matter how many values are recorded.
+    """
+
+    sub_bucket_bits = 11
+    sub_buckets = 1 << sub_bucket_bits
+    half = sub_buckets >> 1
+
+    def __init__(self, highest_trackable_us: int = 3_600_000_000):
+        # values above the highest trackable one are counted in the last bucket
+        self.counts = np.zeros(self.index(highest_trackable_us) + 1, dtype=np.int64)
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.sum = 0
+
+    @classmethod
+    def index(cls, value: int) -> int:
+        if value < cls.sub_buckets:
+            return value
+        shift = value.bit_length() - cls.sub_bucket_bits
+        return cls.sub_buckets + (shift - 1) * cls.half + (value >> shift) - cls.half
+
+    @classmethod
+    def highest_equivalent_value(cls, index: int) -> int:
+        """
+        Returns the largest value counted in the bucket at the given index.
+        """
+        if index < cls.sub_buckets:
+            return index
+        shift, offset = divmod(index - cls.sub_buckets, cls.half)
+        shift += 1
+        return ((offset + cls.half + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = max(int(seconds * 1_000_000), 0)
+        self.counts[min(self.index(value), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Returns the latency in milliseconds that the given percentage of all recorded latencies are at or below,
+        or None for an empty histogram.
+        """
+        if not self.total:
+            return None
+
+        rank = max(int(np.ceil(percentile / 100 * self.total)), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self.highest_equivalent_value(index), self.max) / 1000
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.total / 1000 if self.total else None
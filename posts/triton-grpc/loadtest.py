@@ -3,6 +3,7 @@ import sys
 
 import numpy as np
 import tritonclient.http as httpclient
+import tritonclient.http.aio as aiohttpclient
 from utils import test_output
 
 @molotov.global_setup()
@@ -24,12 +25,21 @@ def get_triton_client():
 
     return triton_client
 
+def get_async_triton_client(url="localhost:8000"):
+    # the asyncio client doesn't block the event loop of the open-loop load generator while waiting for a response
+    return aiohttpclient.InferenceServerClient(url=url, verbose=False)
+
 @molotov.scenario(100)
 async def infer(session):
     inputs, outputs, input0_data, input1_data = get_inputs_and_outputs()
     results = triton_client.async_infer(model_name="simple", inputs=inputs, outputs=outputs).get_result()
     test_output(input0_data, input1_data, results)
 
+async def infer_once(client):
+    inputs, outputs, input0_data, input1_data = get_inputs_and_outputs()
+    results = await client.infer(model_name="simple", inputs=inputs, outputs=outputs)
+    test_output(input0_data, input1_data, results)
+
 def get_inputs_and_outputs():
     # Infer
     inputs = []
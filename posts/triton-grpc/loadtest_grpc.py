@@ -11,10 +11,10 @@ def init_test(args):
     global triton_client
     triton_client = get_triton_client()
 
-def get_triton_client():
+def get_triton_client(url="localhost:8001"):
     try:
         triton_client = grpcclient.InferenceServerClient(
-            url="localhost:8001",
+            url=url,
             verbose=False,
         )
     except Exception as e:
@@ -23,10 +23,16 @@ def get_triton_client():
 
     return triton_client
 
+# the client is asyncio based already
+get_async_triton_client = get_triton_client
+
 @molotov.scenario(100)
 async def infer(session):
+    await infer_once(triton_client)
+
+async def infer_once(client):
     inputs, outputs, input0_data, input1_data = get_inputs_and_outputs()
-    results = await triton_client.infer(model_name="simple", inputs=inputs, outputs=outputs)
+    results = await client.infer(model_name="simple", inputs=inputs, outputs=outputs)
     test_output(input0_data, input1_data, results)
 
 def get_inputs_and_outputs():
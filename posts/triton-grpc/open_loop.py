@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import importlib
+import json
+from pathlib import Path
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from histogram import LatencyHistogram
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LoadResult(NamedTuple):
+    sent: int
+    successes: int
+    failures: int
+    timeouts: int  # the failures which timed out, their latencies are recorded as well
+    dropped: int  # not sent, because max_in_flight requests were still waiting for a response
+    elapsed: float  # seconds from the first scheduled request to the last response
+    histogram: LatencyHistogram
+
+    @property
+    def throughput(self) -> float:
+        return self.successes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> dict[str, Optional[float]]:
+        return {
+            "sent": self.sent,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "dropped": self.dropped,
+            "throughput": round(self.throughput, 2),
+            **{f"p{percentile:g}_ms": self.histogram.percentile(percentile) for percentile in PERCENTILES},
+            "max_ms": self.histogram.max / 1000 if self.histogram.max is not None else None
+        }
+
+
+async def run_open_loop(
+        send: Callable[[], Awaitable[object]],
+        rate: float,
+        duration: float,
+        timeout: float = 10.0,
+        max_in_flight: Optional[int] = None
+) -> LoadResult:
+    """
+    Starts requests at a fixed rate, regardless of whether earlier ones have been answered (an open loop).
+    A closed loop, where each worker waits for its response before sending the next request, sends fewer requests
+    while the server stalls and so never measures the requests that would have waited behind the stall
+    (coordinated omission). Here, every latency is measured from the time the request was scheduled to be sent,
+    so time spent waiting for the client itself counts as well. Requests which time out are recorded with the time
+    they waited, otherwise the slowest requests would be missing from the percentiles.
+
+    :param send: Sends one request and raises on failure.
+    :param rate: Requests per second.
+    :param duration: Seconds to send requests for.
+    :param timeout: Seconds after which a request counts as failed.
+    :param max_in_flight: Requests which would exceed this many unanswered ones are dropped and counted as such.
+    """
+    loop = asyncio.get_running_loop()
+    histogram = LatencyHistogram()
+    in_flight: set[asyncio.Task] = set()
+    successes = failures = timeouts = dropped = 0
+
+    async def request(scheduled: float):
+        nonlocal successes, failures, timeouts
+        try:
+            await asyncio.wait_for(send(), timeout)
+        except asyncio.TimeoutError:
+            failures += 1
+            timeouts += 1
+            histogram.record(loop.time() - scheduled)
+        except Exception:
+            failures += 1
+        else:
+            successes += 1
+            histogram.record(loop.time() - scheduled)
+
+    n_requests = int(rate * duration)
+    start = loop.time()
+    for i in range(n_requests):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if max_in_flight is not None and len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+
+        task = asyncio.create_task(request(scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    await asyncio.gather(*in_flight)
+    return LoadResult(
+        sent=n_requests - dropped,
+        successes=successes,
+        failures=failures,
+        timeouts=timeouts,
+        dropped=dropped,
+        elapsed=loop.time() - start,
+        histogram=histogram
+    )
+
+
+async def run_scenario(
+        scenario: str,
+        url: str,
+        rate: float,
+        duration: float,
+        warmup: float,
+        timeout: float,
+        max_in_flight: Optional[int]
+) -> LoadResult:
+    """
+    Runs the infer_once requests of a scenario (loadtest.py or loadtest_grpc.py) against url.
+    """
+    module = importlib.import_module(Path(scenario).stem)
+    client = module.get_async_triton_client(url)
+    try:
+        # connections are opened and the server warmed up before anything is measured
+        if warmup > 0:
+            await run_open_loop(lambda: module.infer_once(client), rate, warmup, timeout, max_in_flight)
+        return await run_open_loop(lambda: module.infer_once(client), rate, duration, timeout, max_in_flight)
+    finally:
+        await client.close()
+
+
+def main():
+    # one process per scenario, the molotov setup of loadtest.py and loadtest_grpc.py can only be registered once
+    parser = argparse.ArgumentParser(description="Runs one open-loop configuration and prints its summary as JSON")
+    parser.add_argument("scenario", choices=["loadtest.py", "loadtest_grpc.py"])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--rate", required=True, type=float, help="Requests per second")
+    parser.add_argument("--duration", required=True, type=float, help="Seconds")
+    parser.add_argument("--warmup", default=2, type=float, help="Seconds of unmeasured requests before the measurement")
+    parser.add_argument("--timeout", default=10, type=float, help="Seconds after which a request counts as failed")
+    parser.add_argument("--max-in-flight", default=None, type=int, help="Drop requests beyond this many unanswered ones")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_scenario(
+        args.scenario, args.url, args.rate, args.duration, args.warmup, args.timeout, args.max_in_flight
+    ))
+    print(json.dumps(result.summary()))
+
+
+if __name__ == "__main__":
+    main()
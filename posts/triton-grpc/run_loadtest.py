@@ -0,0 +1,121 @@
+import argparse
+import csv
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from itertools import product
+from pathlib import Path
+
+from tqdm import tqdm
+
+from histogram import LatencyHistogram
+from open_loop import LoadResult
+
+# the scenarios of run_molotov.py and the address of the Triton endpoint each one talks to
+DEFAULT_URLS = {"loadtest.py": "localhost:8000", "loadtest_grpc.py": "localhost:8001"}
+
+# the columns of open_loop.py's summary, known before the first configuration has run
+SUMMARY_FIELDS = list(LoadResult(0, 0, 0, 0, 0, 0.0, LatencyHistogram()).summary())
+
+
+def run_configuration(args: argparse.Namespace, scenario: str, url: str, rate: float, duration: float) -> dict:
+    command = [
+        sys.executable, str(Path(__file__).parent / "open_loop.py"), scenario,
+        "--url", url,
+        "--rate", str(rate),
+        "--duration", str(duration),
+        "--warmup", str(args.warmup),
+        "--timeout", str(args.timeout)
+    ]
+    if args.max_in_flight is not None:
+        command += ["--max-in-flight", str(args.max_in_flight)]
+
+    # errors of the scenario show up on stderr as they happen
+    completed_process = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed_process.stdout.decode().splitlines()[-1])
+
+
+def is_ready(http_url: str, grpc_url: str) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://{http_url}/v2/health/ready", timeout=1) as response:
+            if response.status != 200:
+                return False
+        host, port = grpc_url.rsplit(":", 1)
+        with socket.create_connection((host, int(port)), timeout=1):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    stub = subprocess.Popen([
+        sys.executable, str(Path(__file__).parent / "stub_server.py"),
+        "--http-port", args.http_url.rsplit(":", 1)[1],
+        "--grpc-port", args.grpc_url.rsplit(":", 1)[1],
+        "--delay-ms", str(args.stub_delay_ms),
+        "--stall-ms", str(args.stub_stall_ms),
+        "--stall-every", str(args.stub_stall_every)
+    ])
+    deadline = time.monotonic() + args.stub_startup_timeout
+    while not is_ready(args.http_url, args.grpc_url):
+        if stub.poll() is not None:
+            sys.exit("The stub server could not be started")
+        if time.monotonic() > deadline:
+            stub.terminate()
+            stub.wait()
+            sys.exit(f"The stub server was not ready after {args.stub_startup_timeout:g}s")
+        time.sleep(0.1)
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sends requests to Triton at fixed rates (open-loop) and records latency percentiles per configuration"
+    )
+    parser.add_argument("--scenarios", nargs="+", default=list(DEFAULT_URLS), choices=list(DEFAULT_URLS))
+    parser.add_argument("--rates", nargs="+", default=[50, 100, 200, 400], type=float, help="Requests per second")
+    parser.add_argument("--durations", nargs="+", default=[10, 30], type=float, help="Seconds per configuration")
+    parser.add_argument("--warmup", default=2, type=float, help="Seconds of unmeasured requests before each configuration")
+    parser.add_argument("--timeout", default=10, type=float, help="Seconds after which a request counts as failed")
+    parser.add_argument("--max-in-flight", default=None, type=int, help="Drop requests beyond this many unanswered ones")
+    parser.add_argument("--http-url", default=DEFAULT_URLS["loadtest.py"])
+    parser.add_argument("--grpc-url", default=DEFAULT_URLS["loadtest_grpc.py"])
+    parser.add_argument("--output", default=Path("latencies.csv"), type=Path)
+    parser.add_argument("--stub", action="store_true", help="Run against a local stub server instead of Triton")
+    parser.add_argument("--stub-delay-ms", default=0.0, type=float)
+    parser.add_argument("--stub-stall-ms", default=0.0, type=float)
+    parser.add_argument("--stub-stall-every", default=0, type=int)
+    parser.add_argument("--stub-startup-timeout", default=30, type=float, help="Seconds to wait for the stub to be ready")
+    args = parser.parse_args()
+
+    urls = {"loadtest.py": args.http_url, "loadtest_grpc.py": args.grpc_url}
+    stub = start_stub(args) if args.stub else None
+
+    try:
+        # every row is written as soon as its configuration finishes, so a failing one doesn't lose the others
+        with args.output.open("w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["scenario", "duration", "rate", *SUMMARY_FIELDS, "error"])
+            writer.writeheader()
+
+            configurations = list(product(args.durations, args.rates, args.scenarios))
+            for duration, rate, scenario in tqdm(configurations):
+                row = {"scenario": scenario, "duration": duration, "rate": rate}
+                try:
+                    row.update(run_configuration(args, scenario, urls[scenario], rate, duration))
+                except subprocess.CalledProcessError as error:
+                    tqdm.write(f"{scenario} at {rate:g}/s for {duration:g}s failed with exit status {error.returncode}")
+                    row["error"] = f"exit status {error.returncode}"
+                writer.writerow(row)
+                file.flush()
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+
+if __name__ == "__main__":
+    main()
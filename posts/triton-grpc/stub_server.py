@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import numpy as np
+
+# the model of model_repository/simple: OUTPUT0 = INPUT0 + INPUT1, OUTPUT1 = INPUT0 - INPUT1
+MODEL_NAME = "simple"
+INPUT_NAMES = ("INPUT0", "INPUT1")
+OUTPUT_NAMES = ("OUTPUT0", "OUTPUT1")
+
+
+class Latency:
+    """
+    Adds a fixed delay to every response and a stall to every n-th, to see how tail latencies show up in a load test.
+    Shared by all requests of all protocols.
+    """
+
+    def __init__(self, delay_ms: float = 0.0, stall_ms: float = 0.0, stall_every: int = 0):
+        self.delay = delay_ms / 1000
+        self.stall = stall_ms / 1000
+        self.stall_every = stall_every
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def next(self) -> float:
+        with self.lock:
+            n = next(self.counter)
+        return self.delay + (self.stall if self.stall_every and n % self.stall_every == 0 else 0.0)
+
+
+def simple_model(input0: np.ndarray, input1: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return input0 + input1, input0 - input1
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """
+    Answers the KServe v2 inference requests tritonclient.http sends for the simple model,
+    with tensors as JSON data or as binary data after the JSON header.
+    """
+
+    protocol_version = "HTTP/1.1"
+    latency: Latency
+
+    def do_GET(self):
+        if self.path in ("/v2/health/live", "/v2/health/ready", f"/v2/models/{MODEL_NAME}/ready"):
+            self.respond(200, b"")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in (f"/v2/models/{MODEL_NAME}/infer", f"/v2/models/{MODEL_NAME}/versions/1/infer"):
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        header_length = int(self.headers.get("Inference-Header-Content-Length", len(body)))
+        request = json.loads(body[:header_length])
+
+        tensors = {}
+        offset = header_length
+        for tensor in request["inputs"]:
+            size = tensor.get("parameters", {}).get("binary_data_size")
+            if size is None:
+                data = np.array(tensor["data"], dtype=np.int32)
+            else:
+                data = np.frombuffer(body[offset:offset + size], dtype=np.int32)
+                offset += size
+            tensors[tensor["name"]] = data.reshape(tensor["shape"])
+
+        if set(INPUT_NAMES) - tensors.keys():
+            self.send_error(400, f"Expected the inputs {', '.join(INPUT_NAMES)}")
+            return
+
+        time.sleep(self.latency.next())
+        results = dict(zip(OUTPUT_NAMES, simple_model(*(tensors[name] for name in INPUT_NAMES))))
+
+        requested = {output["name"]: output for output in request.get("outputs", [])} or {name: {} for name in OUTPUT_NAMES}
+        outputs, binary = [], []
+        for name, options in requested.items():
+            output = {"name": name, "datatype": "INT32", "shape": list(results[name].shape)}
+            if options.get("parameters", {}).get("binary_data", False):
+                data = results[name].tobytes()
+                output["parameters"] = {"binary_data_size": len(data)}
+                binary.append(data)
+            else:
+                output["data"] = results[name].flatten().tolist()
+            outputs.append(output)
+
+        response = {"model_name": MODEL_NAME, "model_version": "1", "outputs": outputs}
+        if "id" in request:
+            response["id"] = request["id"]
+        header = json.dumps(response).encode()
+        self.respond(200, header + b"".join(binary), {"Inference-Header-Content-Length": str(len(header))} if binary else {})
+
+    def respond(self, status: int, body: bytes, headers: Optional[dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        # one line per request would slow down the server under load
+        pass
+
+
+def make_http_server(host: str, port: int, latency: Latency) -> ThreadingHTTPServer:
+    handler = type("BoundInferenceHandler", (InferenceHandler,), {"latency": latency, "disable_nagle_algorithm": True})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+async def serve_grpc(host: str, port: int, latency: Latency):
+    # the generated service of tritonclient[grpc], only needed for the gRPC endpoint
+    import grpc
+    from tritonclient.grpc import service_pb2, service_pb2_grpc
+
+    class InferenceService(service_pb2_grpc.GRPCInferenceServiceServicer):
+        async def ServerLive(self, request, context):
+            return service_pb2.ServerLiveResponse(live=True)
+
+        async def ServerReady(self, request, context):
+            return service_pb2.ServerReadyResponse(ready=True)
+
+        async def ModelReady(self, request, context):
+            return service_pb2.ModelReadyResponse(ready=request.name == MODEL_NAME)
+
+        async def ModelInfer(self, request, context):
+            tensors = {}
+            for i, tensor in enumerate(request.inputs):
+                if request.raw_input_contents:
+                    data = np.frombuffer(request.raw_input_contents[i], dtype=np.int32)
+                else:
+                    data = np.array(tensor.contents.int_contents, dtype=np.int32)
+                tensors[tensor.name] = data.reshape(tensor.shape)
+
+            if set(INPUT_NAMES) - tensors.keys():
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Expected the inputs {', '.join(INPUT_NAMES)}")
+
+            await asyncio.sleep(latency.next())
+            results = dict(zip(OUTPUT_NAMES, simple_model(*(tensors[name] for name in INPUT_NAMES))))
+
+            response = service_pb2.ModelInferResponse(model_name=MODEL_NAME, model_version="1", id=request.id)
+            for name in [output.name for output in request.outputs] or OUTPUT_NAMES:
+                output = response.outputs.add()
+                output.name = name
+                output.datatype = "INT32"
+                output.shape.extend(results[name].shape)
+                response.raw_output_contents.append(results[name].tobytes())
+            return response
+
+    server = grpc.aio.server()
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(InferenceService(), server)
+    server.add_insecure_port(f"{host}:{port}")
+    await server.start()
+    await server.wait_for_termination()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A stand-in for Triton serving the simple model, to test the load tests against")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--http-port", default=8000, type=int, help="0 disables the HTTP endpoint")
+    parser.add_argument("--grpc-port", default=8001, type=int, help="0 disables the gRPC endpoint")
+    parser.add_argument("--delay-ms", default=0.0, type=float, help="Added to every response")
+    parser.add_argument("--stall-ms", default=0.0, type=float, help="Added to every --stall-every-th response")
+    parser.add_argument("--stall-every", default=0, type=int)
+    args = parser.parse_args()
+
+    latency = Latency(args.delay_ms, args.stall_ms, args.stall_every)
+    if args.http_port:
+        http_server = make_http_server(args.host, args.http_port, latency)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        print(f"Serving HTTP on {args.host}:{args.http_port}", flush=True)
+
+    try:
+        if args.grpc_port:
+            print(f"Serving gRPC on {args.host}:{args.grpc_port}", flush=True)
+            asyncio.run(serve_grpc(args.host, args.grpc_port, latency))
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()